@@ -0,0 +1,64 @@
+"""initial schema
+
+Revision ID: 3f1c2a9d8e47
+Revises:
+Create Date: 2026-10-17 12:00:00.000000
+
+The schema the application created with `create_all` on startup before migrations existed.
+Databases created that way already have it; mark them as migrated with `alembic stamp 3f1c2a9d8e47`,
+then run `alembic upgrade head` like any other database.
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "3f1c2a9d8e47"
+down_revision: str | None = None
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+ENUM_NAMES = ("outputformat", "ratio", "status")
+
+
+def upgrade() -> None:
+    op.create_table(
+        "users",
+        sa.Column("id", sa.UUID(), nullable=False),
+        sa.Column("google_id", sa.String(length=64), nullable=False),
+        sa.Column("name", sa.String(length=255), nullable=False),
+        sa.Column("email", sa.String(length=128), nullable=False),
+        sa.Column("picture", sa.String(length=1024), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("last_login", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("credits", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("email"),
+        sa.UniqueConstraint("google_id"),
+    )
+    op.create_table(
+        "generations",
+        sa.Column("id", sa.UUID(), nullable=False),
+        sa.Column("user_id", sa.UUID(), nullable=False),
+        sa.Column("prompt", sa.String(length=1024), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("output_format", sa.Enum("PNG", "JPG", name="outputformat"), nullable=False),
+        sa.Column("ratio", sa.Enum("RATIO_1_1", "RATIO_16_9", "RATIO_4_3", name="ratio"), nullable=False),
+        sa.Column(
+            "status", sa.Enum("PENDING", "IN_PROGRESS", "COMPLETED", "FAILED", name="status"), nullable=False
+        ),
+        sa.Column("error_message", sa.String(length=1024), nullable=True),
+        sa.Column("filename", sa.String(length=1024), nullable=True),
+        sa.Column("size", sa.Integer(), nullable=True),
+        sa.Column("content_type", sa.String(length=64), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("generations")
+    op.drop_table("users")
+    for name in ENUM_NAMES:
+        sa.Enum(name=name).drop(op.get_bind(), checkfirst=True)
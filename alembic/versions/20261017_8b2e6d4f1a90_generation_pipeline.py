@@ -0,0 +1,118 @@
+"""generation pipeline
+
+Revision ID: 8b2e6d4f1a90
+Revises: 3f1c2a9d8e47
+Create Date: 2026-10-17 12:30:00.000000
+
+Adds the row versions, the generation options and derivatives, the credit ledger,
+the object deletion outbox and the processed payment events.
+Existing generations get their creation time as `updated_at` and a cost of 0, so they are never refunded.
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "8b2e6d4f1a90"
+down_revision: str | None = "3f1c2a9d8e47"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    # The defaults only fill the existing rows; the application sets these columns itself
+    op.add_column(
+        "users",
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+    )
+    op.alter_column("users", "updated_at", server_default=None)
+
+    op.add_column(
+        "generations",
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+    )
+    op.execute("UPDATE generations SET updated_at = created_at")
+    op.alter_column("generations", "updated_at", server_default=None)
+    op.add_column("generations", sa.Column("seed", sa.Integer(), nullable=True))
+    op.add_column("generations", sa.Column("checksum", sa.String(length=64), nullable=True))
+    op.add_column("generations", sa.Column("thumbnail_filename", sa.String(length=1024), nullable=True))
+    op.add_column("generations", sa.Column("preview_filename", sa.String(length=1024), nullable=True))
+    op.add_column("generations", sa.Column("prediction_id", sa.String(length=64), nullable=True))
+    op.add_column("generations", sa.Column("cost", sa.Integer(), nullable=False, server_default="0"))
+    op.alter_column("generations", "cost", server_default=None)
+    op.create_index(
+        "ix_generations_user_id_created_at_id",
+        "generations",
+        ["user_id", sa.literal_column("created_at DESC"), sa.literal_column("id DESC")],
+        unique=False,
+    )
+
+    op.create_table(
+        "credit_ledger",
+        sa.Column("id", sa.UUID(), nullable=False),
+        sa.Column("user_id", sa.UUID(), nullable=False),
+        sa.Column("generation_id", sa.UUID(), nullable=True),
+        sa.Column("amount", sa.Integer(), nullable=False),
+        sa.Column("balance", sa.Integer(), nullable=False),
+        sa.Column("reason", sa.Enum("GENERATION", "REFUND", "PURCHASE", name="creditreason"), nullable=False),
+        sa.Column("reference", sa.String(length=255), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(["generation_id"], ["generations.id"], ondelete="SET NULL"),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_credit_ledger_user_id_created_at", "credit_ledger", ["user_id", "created_at"], unique=False
+    )
+
+    op.create_table(
+        "object_deletions",
+        sa.Column("id", sa.UUID(), nullable=False),
+        sa.Column("path", sa.String(length=1024), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("next_attempt_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("last_error", sa.String(length=1024), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_object_deletions_next_attempt_at", "object_deletions", ["next_attempt_at"], unique=False
+    )
+
+    op.create_table(
+        "processed_events",
+        sa.Column("id", sa.UUID(), nullable=False),
+        sa.Column("provider", sa.String(length=32), nullable=False),
+        sa.Column("identifier", sa.String(length=255), nullable=False),
+        sa.Column("user_email", sa.String(length=128), nullable=False),
+        sa.Column("units", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("processed_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("error", sa.String(length=1024), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_processed_events_provider_identifier",
+        "processed_events",
+        ["provider", "identifier"],
+        unique=True,
+    )
+    op.create_index(
+        "ix_processed_events_pending",
+        "processed_events",
+        ["created_at"],
+        unique=False,
+        postgresql_where=sa.text("processed_at IS NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("processed_events")
+    op.drop_table("object_deletions")
+    op.drop_table("credit_ledger")
+    sa.Enum(name="creditreason").drop(op.get_bind(), checkfirst=True)
+    op.drop_index("ix_generations_user_id_created_at_id", table_name="generations")
+    for column in ("cost", "prediction_id", "preview_filename", "thumbnail_filename", "checksum", "seed", "updated_at"):
+        op.drop_column("generations", column)
+    op.drop_column("users", "updated_at")
@@ -1,13 +1,17 @@
+import hmac
+import time
 import uuid
 from collections.abc import AsyncGenerator
 from typing import Annotated
 
-from fastapi import Cookie, Depends, HTTPException, status
-from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import Cookie, Depends, Header, HTTPException, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
 from app.config import get_settings
 from app.core.auth import GoogleOAuth2Provider
-from app.db.config import SessionLocal
+from app.core.security import InvalidTokenError, SessionClaims, create_session_token, decode_session_token
+from app.core.users import cache_user, get_cached_user
+from app.db.config import ReplicaSessionLocal, SessionLocal, get_replica_monitor
 from app.db.models import UserORM
 
 settings = get_settings()
@@ -22,23 +26,103 @@ async def get_google_auth_provider() -> GoogleOAuth2Provider:
     )
 
 
+PRIMARY_COOKIE_NAME = "primary_until"
+
+
 async def get_db() -> AsyncGenerator[AsyncSession]:
     async with SessionLocal() as session:
         yield session
 
 
-async def get_current_user(
-    user_id: Annotated[uuid.UUID, Cookie()],
-    session: Annotated[AsyncSession, Depends(get_db)],
-) -> UserORM:
-    if not user_id:
+async def get_read_db(
+    primary_until: Annotated[int | None, Cookie(alias=PRIMARY_COOKIE_NAME)] = None,
+) -> AsyncGenerator[AsyncSession]:
+    """
+    Provide a session for read-only endpoints, on the read replica when it is usable.
+    Users who just changed data keep reading from the primary so they see their own writes.
+    """
+
+    session_factory = await get_read_session_factory(primary_until)
+    async with session_factory() as session:
+        yield session
+
+
+async def get_read_session_factory(primary_until: int | None = None) -> async_sessionmaker[AsyncSession]:
+    """Return the session factory of the read replica when it is usable, otherwise the one of the primary."""
+
+    replica_monitor = get_replica_monitor()
+    if (
+        ReplicaSessionLocal is not None
+        and replica_monitor is not None
+        and (primary_until is None or primary_until <= time.time())
+        and await replica_monitor.is_usable()
+    ):
+        return ReplicaSessionLocal
+    return SessionLocal
+
+
+def stick_to_primary(response: Response) -> None:
+    """Send the reads of the user to the primary for `READ_YOUR_WRITES_WINDOW` seconds after a write."""
+    response.set_cookie(
+        key=PRIMARY_COOKIE_NAME,
+        value=str(int(time.time()) + settings.READ_YOUR_WRITES_WINDOW),
+        max_age=settings.READ_YOUR_WRITES_WINDOW,
+        httponly=True,
+        secure=settings.ENVIRONMENT != "local",
+        samesite="lax",
+    )
+
+
+def set_session_cookie(response: Response, user_id: uuid.UUID, email: str) -> None:
+    """Issue a new session token for the user in the response cookies."""
+    response.set_cookie(
+        key=settings.SESSION_COOKIE_NAME,
+        value=create_session_token(user_id, email),
+        max_age=settings.SESSION_TOKEN_EXPIRES_IN,
+        httponly=True,
+        secure=settings.ENVIRONMENT != "local",
+        samesite="lax",
+    )
+
+
+async def get_current_session(
+    response: Response,
+    session_token: Annotated[str | None, Cookie(alias=settings.SESSION_COOKIE_NAME)] = None,
+) -> SessionClaims:
+    """
+    Authenticate the request from its session token, without any database lookup.
+    The token is renewed once half of its lifetime has elapsed.
+    """
+
+    if not session_token:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User ID missing in cookie",
+            detail="Session token missing in cookie",
         )
 
+    try:
+        claims = decode_session_token(session_token)
+    except InvalidTokenError as e:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=str(e))
+
+    if claims.expires_in < settings.SESSION_TOKEN_EXPIRES_IN // 2:
+        set_session_cookie(response, claims.user_id, claims.email)
+
+    return claims
+
+
+async def get_current_user(
+    claims: Annotated[SessionClaims, Depends(get_current_session)],
+    session: Annotated[AsyncSession, Depends(get_read_db)],
+) -> UserORM:
+    """Load the authenticated user, reusing a recent snapshot when available."""
+
+    user_orm = get_cached_user(claims.user_id)
+    if user_orm:
+        return user_orm
+
     async with session.begin():
-        user_orm = await session.get(UserORM, user_id)
+        user_orm = await session.get(UserORM, claims.user_id)
 
         if not user_orm:
             raise HTTPException(
@@ -46,4 +130,23 @@ async def get_current_user(
                 detail="User not found",
             )
 
+        # Detach the snapshot so it can be shared with other requests
+        session.expunge(user_orm)
+
+    cache_user(user_orm)
     return user_orm
+
+
+async def require_monitoring_token(authorization: Annotated[str | None, Header()] = None) -> None:
+    """Restrict the monitoring endpoints to the holders of `MONITORING_TOKEN`, and hide them when it is not set."""
+
+    if not settings.MONITORING_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Monitoring is not enabled")
+
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), settings.MONITORING_TOKEN.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid monitoring token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
@@ -0,0 +1,32 @@
+from collections.abc import Mapping
+from typing import Any
+
+import pydantic_core
+from fastapi import Response
+from fastapi.responses import JSONResponse
+
+
+class PydanticJSONResponse(JSONResponse):
+    """
+    JSON response encoded in a single pass by pydantic-core, which handles models, UUIDs, datetimes and enums.
+
+    Returning it from a route skips FastAPI's validation and encoding against the `response_model`,
+    which still documents the route, so its content must be built from trusted data.
+    The headers and cookies set on the `response` of the route, given as `sub_response`, are kept.
+    """
+
+    def __init__(
+        self,
+        content: Any,
+        status_code: int = 200,
+        headers: Mapping[str, str] | None = None,
+        sub_response: Response | None = None,
+    ) -> None:
+        super().__init__(content, status_code=status_code, headers=headers)
+        if sub_response is not None:
+            self.raw_headers.extend(
+                (name, value) for name, value in sub_response.raw_headers if name != b"content-length"
+            )
+
+    def render(self, content: Any) -> bytes:
+        return pydantic_core.to_json(content)
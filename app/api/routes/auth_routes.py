@@ -1,14 +1,16 @@
 from datetime import UTC, datetime
 from typing import Annotated, Any
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Header, Response
 from fastapi.responses import RedirectResponse
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.deps import get_current_user, get_db, get_google_auth_provider
+from app.api.deps import get_current_user, get_db, get_google_auth_provider, set_session_cookie, stick_to_primary
 from app.config import get_settings
 from app.core.auth import GoogleOAuth2Provider
+from app.core.etag import etag_matches, make_etag, not_modified, set_etag
+from app.core.users import broadcast_user_invalidation
 from app.db.models import UserORM
 from app.schemas.users import UserProfile
 
@@ -59,18 +61,25 @@ async def auth_via_google(
             user_orm.picture = user_info.get("picture")
             user_orm.last_login = datetime.now(UTC)
 
+    await broadcast_user_invalidation(user_orm.id)
+
     response = RedirectResponse("/users/profile")
-    response.set_cookie(
-        key="user_id",
-        value=str(user_orm.id),
-        httponly=True,
-        secure=settings.ENVIRONMENT != "local",
-        samesite="lax",
-    )
+    set_session_cookie(response, user_orm.id, user_orm.email)
+    stick_to_primary(response)
     return response
 
 
 @router.get("/users/profile", response_model=UserProfile)
-async def get_profile(current_user: Annotated[UserORM, Depends(get_current_user)]) -> Any:
-    """Returns the profile of the currently authenticated user."""
+async def get_profile(
+    current_user: Annotated[UserORM, Depends(get_current_user)],
+    response: Response,
+    if_none_match: Annotated[str | None, Header()] = None,
+) -> Any:
+    """Returns the profile of the currently authenticated user, or 304 if the client's copy is current."""
+
+    etag = make_etag(current_user.id, current_user.updated_at)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
+    set_etag(response, etag)
     return current_user
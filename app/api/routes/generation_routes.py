@@ -1,59 +1,104 @@
+import logging
+import time
 import uuid
-from datetime import timedelta
+from collections.abc import AsyncIterator, Sequence
+from datetime import datetime
 from typing import Annotated, Any
 
-import obstore as obs
-from fastapi import APIRouter, BackgroundTasks, Depends, Form, HTTPException, Query, status
-from sqlalchemy import func, select
-from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import APIRouter, Depends, Form, Header, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import delete, func, insert, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
-from app.api.deps import get_current_user, get_db
+from app.api.deps import get_current_session, get_db, get_read_db, get_read_session_factory, stick_to_primary
+from app.api.responses import PydanticJSONResponse
 from app.config import get_settings
-from app.core.storage import store
-from app.db.models import GenerationORM, OutputFormat, Ratio, Status, UserORM
+from app.core.credits import InsufficientCreditsError, reserve_credits
+from app.core.etag import etag_matches, make_etag, not_modified, set_etag
+from app.core.events import event_broker, generation_channel
+from app.core.metrics import GENERATION_STATUS_TRANSITIONS
+from app.core.pagination import InvalidCursorError, decode_cursor, encode_cursor
+from app.core.security import SessionClaims
+from app.core.signing import signed_urls
+from app.db.config import SessionLocal
+from app.db.models import GenerationORM, OutputFormat, Ratio, Status
+from app.dramatiq_app import enqueue_generations, enqueue_object_sweep
+from app.object_gc import schedule_object_deletions
 from app.schemas.generations import (
     DownloadURLResponse,
+    GenerationBatchCreate,
+    GenerationBatchCreateResponse,
+    GenerationBulkDeleteResponse,
     GenerationCreateResponse,
     GenerationData,
     GenerationList,
     GenerationStatus,
+    GenerationStatusList,
+    GenerationStatusQuery,
 )
-from app.tasks import generate_image_task
+from app.tasks import fail_generation
 
 settings = get_settings()
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 
+async def dispatch_generations(generation_ids: Sequence[uuid.UUID]) -> None:
+    """
+    Hand the generations just created over to the workers.
+    If the broker cannot take them, they are failed and refunded instead of staying pending with their credits held.
+    """
+
+    try:
+        await enqueue_generations(generation_ids)
+    except Exception as err:
+        logger.warning("Failed to enqueue %d generations", len(generation_ids), exc_info=True)
+        for generation_id in generation_ids:
+            await fail_generation(generation_id, err, final_attempt=True)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="The generation service is unavailable, your credits were refunded.",
+        )
+
+
 @router.post("/generations/create", status_code=status.HTTP_202_ACCEPTED, response_model=GenerationCreateResponse)
 async def create_generation(
-    background_tasks: BackgroundTasks,
-    current_user: Annotated[UserORM, Depends(get_current_user)],
+    claims: Annotated[SessionClaims, Depends(get_current_session)],
+    response: Response,
     session: Annotated[AsyncSession, Depends(get_db)],
     prompt: Annotated[str, Form()],
     output_format: Annotated[OutputFormat, Form()] = OutputFormat.PNG,
     ratio: Annotated[Ratio, Form()] = Ratio.RATIO_1_1,
+    seed: Annotated[int | None, Form()] = None,
 ) -> Any:
     """Create a new generation request."""
 
-    if current_user.credits <= 0:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You do not have enough credits to create a generation request.",
-        )
-
     generation_orm = GenerationORM(
+        id=uuid.uuid4(),
         prompt=prompt,
-        user_id=current_user.id,
+        user_id=claims.user_id,
         output_format=output_format,
         ratio=ratio,
+        seed=seed,
         status=Status.PENDING,
+        cost=settings.GENERATION_COST,
     )
 
     async with session.begin():
+        try:
+            await reserve_credits(session, claims.user_id, generation_orm.cost, generation_orm.id)
+        except InsufficientCreditsError:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="You do not have enough credits to create a generation request.",
+            )
         session.add(generation_orm)
 
-    background_tasks.add_task(generate_image_task, generation_id=generation_orm.id)
+    GENERATION_STATUS_TRANSITIONS.labels(Status.PENDING).inc()
+    await dispatch_generations([generation_orm.id])
+    stick_to_primary(response)
 
     return GenerationCreateResponse(
         message="Generation request created successfully",
@@ -61,80 +106,273 @@ async def create_generation(
     )
 
 
+@router.post("/generations/batch", status_code=status.HTTP_202_ACCEPTED, response_model=GenerationBatchCreateResponse)
+async def create_generations_batch(
+    batch: GenerationBatchCreate,
+    claims: Annotated[SessionClaims, Depends(get_current_session)],
+    response: Response,
+    session: Annotated[AsyncSession, Depends(get_db)],
+) -> Any:
+    """Create several generation requests at once."""
+
+    cost = settings.GENERATION_COST
+    rows = [
+        {
+            "prompt": item.prompt,
+            "user_id": claims.user_id,
+            "output_format": item.output_format,
+            "ratio": item.ratio,
+            "seed": item.seed,
+            "status": Status.PENDING,
+            "cost": cost,
+        }
+        for item in batch.items
+    ]
+
+    async with session.begin():
+        try:
+            await reserve_credits(
+                session, claims.user_id, cost * len(rows), reference=f"batch of {len(rows)} generations"
+            )
+        except InsufficientCreditsError:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="You do not have enough credits to create these generation requests.",
+            )
+        result = await session.scalars(
+            insert(GenerationORM).returning(GenerationORM.id, sort_by_parameter_order=True), rows
+        )
+        generation_ids = list(result)
+
+    GENERATION_STATUS_TRANSITIONS.labels(Status.PENDING).inc(len(generation_ids))
+    await dispatch_generations(generation_ids)
+    stick_to_primary(response)
+
+    return GenerationBatchCreateResponse(
+        message="Generation requests created successfully",
+        generation_ids=generation_ids,
+    )
+
+
+def to_generation_data(
+    generation_orm: GenerationORM, preview_url: str | None, thumbnail_url: str | None
+) -> dict[str, Any]:
+    """
+    Build the fields of `GenerationData` straight from a row, which is trusted, so without validating them.
+    The result is meant to be encoded by a `PydanticJSONResponse`.
+    """
+
+    return {
+        "id": generation_orm.id,
+        "user_id": generation_orm.user_id,
+        "prompt": generation_orm.prompt,
+        "created_at": generation_orm.created_at,
+        "status": generation_orm.status,
+        "output_format": generation_orm.output_format,
+        "size": generation_orm.size,
+        "content_type": generation_orm.content_type,
+        "ratio": generation_orm.ratio,
+        "seed": generation_orm.seed,
+        "filename": generation_orm.filename,
+        "preview_url": preview_url,
+        "thumbnail_url": thumbnail_url,
+    }
+
+
+async def with_image_urls(generations_orm: Sequence[GenerationORM]) -> list[dict[str, Any]]:
+    """
+    Build the data of generations with signed URLs of their thumbnail and preview, all signed at once.
+    Generations stored before derivatives existed are previewed with their original.
+    """
+
+    paths = [
+        path
+        for generation_orm in generations_orm
+        for path in (generation_orm.thumbnail_filename, generation_orm.preview_filename or generation_orm.filename)
+        if path
+    ]
+    urls = await signed_urls.sign_many(paths)
+
+    data = []
+    for generation_orm in generations_orm:
+        preview_filename = generation_orm.preview_filename or generation_orm.filename
+        thumbnail_filename = generation_orm.thumbnail_filename
+        data.append(
+            to_generation_data(
+                generation_orm,
+                preview_url=urls[preview_filename].url if preview_filename else None,
+                thumbnail_url=urls[thumbnail_filename].url if thumbnail_filename else None,
+            )
+        )
+    return data
+
+
 @router.get("/generations", response_model=GenerationList)
 async def get_generations(
-    current_user: Annotated[UserORM, Depends(get_current_user)],
-    session: Annotated[AsyncSession, Depends(get_db)],
+    claims: Annotated[SessionClaims, Depends(get_current_session)],
+    response: Response,
+    session: Annotated[AsyncSession, Depends(get_read_db)],
     offset: Annotated[int, Query(ge=0)] = 0,
     limit: Annotated[int, Query(le=100)] = 10,
+    cursor: Annotated[str | None, Query()] = None,
+    include_count: Annotated[bool, Query()] = True,
+    if_none_match: Annotated[str | None, Header()] = None,
 ) -> Any:
-    """Retrieve all generations for the current user."""
+    """
+    Retrieve all generations for the current user.
+    Pages are fetched either with `offset` or, more efficiently, with the `next_cursor` of the previous page.
+    Unchanged pages are answered with 304 from a query of the row versions only.
+    The page is encoded straight from the rows by pydantic-core rather than validated against the response model.
+    """
+
+    if cursor and offset:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="The cursor and offset parameters cannot be used together",
+        )
 
     # Get the count of generations for the current user
-    count_statement = select(func.count()).select_from(GenerationORM).where(GenerationORM.user_id == current_user.id)
-    count_result = await session.execute(count_statement)
-    count = count_result.scalars().one()
+    count = None
+    if include_count:
+        count_statement = (
+            select(func.count()).select_from(GenerationORM).where(GenerationORM.user_id == claims.user_id)
+        )
+        count_result = await session.execute(count_statement)
+        count = count_result.scalars().one()
 
     # Get the list of generations for the current user with pagination
     select_statement = (
         select(GenerationORM)
-        .where(GenerationORM.user_id == current_user.id)
-        .offset(offset)
-        .limit(limit)
-        .order_by(GenerationORM.created_at.desc())
+        .where(GenerationORM.user_id == claims.user_id)
+        .order_by(GenerationORM.created_at.desc(), GenerationORM.id.desc())
+        .limit(limit + 1)
     )
+    if cursor:
+        try:
+            cursor_created_at, cursor_id = decode_cursor(cursor)
+        except InvalidCursorError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        select_statement = select_statement.where(
+            tuple_(GenerationORM.created_at, GenerationORM.id) < tuple_(cursor_created_at, cursor_id)
+        )
+    else:
+        select_statement = select_statement.offset(offset)
+
+    if if_none_match:
+        version_statement = select_statement.with_only_columns(GenerationORM.id, GenerationORM.updated_at)
+        versions = [tuple(row) for row in await session.execute(version_statement)]
+        etag = make_etag(count, signed_urls.epoch(), *versions)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+
     result = await session.execute(select_statement)
     generations_orm = result.scalars().all()
+    versions = [(generation_orm.id, generation_orm.updated_at) for generation_orm in generations_orm]
+    set_etag(response, make_etag(count, signed_urls.epoch(), *versions))
+
+    # The extra row only tells whether there is a next page
+    next_cursor = None
+    if len(generations_orm) > limit:
+        generations_orm = generations_orm[:limit]
+        if generations_orm:
+            next_cursor = encode_cursor(generations_orm[-1].created_at, generations_orm[-1].id)
+
+    data = await with_image_urls(generations_orm)
+    return PydanticJSONResponse({"count": count, "data": data, "next_cursor": next_cursor}, sub_response=response)
+
+
+async def get_statuses(
+    session: AsyncSession,
+    user_id: uuid.UUID,
+    generation_ids: list[uuid.UUID],
+    updated_since: datetime | None = None,
+) -> GenerationStatusList:
+    """Fetch the statuses of several generations of a user in a single query."""
+
+    statement = select(
+        GenerationORM.id,
+        GenerationORM.status,
+        GenerationORM.error_message,
+        GenerationORM.updated_at,
+    ).where(
+        GenerationORM.id.in_(generation_ids),
+        GenerationORM.user_id == user_id,
+    )
+    if updated_since:
+        statement = statement.where(GenerationORM.updated_at > updated_since)
+
+    result = await session.execute(statement)
+    return GenerationStatusList(data=[GenerationStatus.model_validate(row) for row in result])
 
-    data = []
-    for generation_orm in generations_orm:
-        generation_data = GenerationData.model_validate(generation_orm)
-        if generation_orm.filename:
-            generation_data.preview_url = await obs.sign_async(
-                store, "GET", generation_orm.filename, expires_in=timedelta(minutes=5)
-            )
-        data.append(generation_data)
 
-    return GenerationList(count=count, data=data)
+@router.get("/generations/status", response_model=GenerationStatusList)
+async def get_generations_status(
+    claims: Annotated[SessionClaims, Depends(get_current_session)],
+    session: Annotated[AsyncSession, Depends(get_read_db)],
+    ids: Annotated[list[uuid.UUID], Query(min_length=1, max_length=settings.STATUS_BATCH_MAX_IDS)],
+    updated_since: Annotated[datetime | None, Query()] = None,
+) -> Any:
+    """
+    Retrieve the status of several generations by ID.
+    With `updated_since`, only the generations changed after that time are returned.
+    """
+    return await get_statuses(session, claims.user_id, ids, updated_since)
+
+
+@router.post("/generations/status", response_model=GenerationStatusList)
+async def query_generations_status(
+    query: GenerationStatusQuery,
+    claims: Annotated[SessionClaims, Depends(get_current_session)],
+    session: Annotated[AsyncSession, Depends(get_read_db)],
+) -> Any:
+    """Retrieve the status of several generations by ID, for lists too long for a query string."""
+    return await get_statuses(session, claims.user_id, query.ids, query.updated_since)
 
 
 @router.get("/generations/{generation_id}", response_model=GenerationData)
 async def get_generation(
     generation_id: uuid.UUID,
-    current_user: Annotated[UserORM, Depends(get_current_user)],
-    session: Annotated[AsyncSession, Depends(get_db)],
+    claims: Annotated[SessionClaims, Depends(get_current_session)],
+    response: Response,
+    session: Annotated[AsyncSession, Depends(get_read_db)],
+    if_none_match: Annotated[str | None, Header()] = None,
 ) -> Any:
-    """Retrieve a specific generation by ID."""
+    """Retrieve a specific generation by ID, or 304 if the client's copy is current."""
 
     statement = select(GenerationORM).where(
         GenerationORM.id == generation_id,
-        GenerationORM.user_id == current_user.id,
+        GenerationORM.user_id == claims.user_id,
     )
+
+    if if_none_match:
+        updated_at = await session.scalar(statement.with_only_columns(GenerationORM.updated_at))
+        if updated_at is not None:
+            etag = make_etag(generation_id, updated_at, signed_urls.epoch())
+            if etag_matches(if_none_match, etag):
+                return not_modified(etag)
+
     result = await session.execute(statement)
     generation_orm = result.scalars().one_or_none()
 
     if not generation_orm:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Generation not found")
 
-    generation_data = GenerationData.model_validate(generation_orm)
-    if generation_orm.filename:
-        generation_data.preview_url = await obs.sign_async(
-            store, "GET", generation_orm.filename, expires_in=timedelta(minutes=5)
-        )
-    return generation_data
+    set_etag(response, make_etag(generation_id, generation_orm.updated_at, signed_urls.epoch()))
+    [generation_data] = await with_image_urls([generation_orm])
+    return PydanticJSONResponse(generation_data, sub_response=response)
 
 
 @router.get("/generations/{generation_id}/download", response_model=DownloadURLResponse)
 async def download_generation(
     generation_id: uuid.UUID,
-    current_user: Annotated[UserORM, Depends(get_current_user)],
-    session: Annotated[AsyncSession, Depends(get_db)],
+    claims: Annotated[SessionClaims, Depends(get_current_session)],
+    session: Annotated[AsyncSession, Depends(get_read_db)],
 ) -> Any:
     """Download a specific generation by ID."""
 
     statement = select(GenerationORM).where(
         GenerationORM.id == generation_id,
-        GenerationORM.user_id == current_user.id,
+        GenerationORM.user_id == claims.user_id,
     )
     result = await session.execute(statement)
     generation_orm = result.scalars().one_or_none()
@@ -144,59 +382,235 @@ async def download_generation(
     if not generation_orm.filename:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No file available for this generation")
 
-    expires_in = timedelta(minutes=5)
-    download_url = await obs.sign_async(store, "GET", generation_orm.filename, expires_in=expires_in)
+    download_url = await signed_urls.sign(generation_orm.filename)
     filename = f"{uuid.uuid4()}.{generation_orm.output_format.value}"
 
     return {
-        "url": download_url,
+        "url": download_url.url,
         "filename": filename,
         "size": generation_orm.size,
         "content_type": generation_orm.content_type,
-        "expires_in": expires_in.total_seconds(),
+        "expires_in": download_url.expires_in,
     }
 
 
 @router.get("/generations/{generation_id}/status", response_model=GenerationStatus)
 async def get_generation_status(
     generation_id: uuid.UUID,
-    current_user: Annotated[UserORM, Depends(get_current_user)],
-    session: Annotated[AsyncSession, Depends(get_db)],
+    claims: Annotated[SessionClaims, Depends(get_current_session)],
+    response: Response,
+    session: Annotated[AsyncSession, Depends(get_read_db)],
+    if_none_match: Annotated[str | None, Header()] = None,
 ) -> Any:
-    """Retrieve the status of a specific generation by ID."""
-
-    statement = select(GenerationORM).where(
+    """Retrieve the status of a specific generation by ID, or 304 if it did not change since the last poll."""
+
+    statement = select(
+        GenerationORM.id,
+        GenerationORM.status,
+        GenerationORM.error_message,
+        GenerationORM.updated_at,
+    ).where(
         GenerationORM.id == generation_id,
-        GenerationORM.user_id == current_user.id,
+        GenerationORM.user_id == claims.user_id,
     )
     result = await session.execute(statement)
-    generation_orm = result.scalar_one_or_none()
+    row = result.one_or_none()
 
-    if generation_orm is None:
+    if row is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Generation not found")
 
-    return generation_orm
+    etag = make_etag(generation_id, row.updated_at)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
+    set_etag(response, etag)
+    return GenerationStatus.model_validate(row)
+
+
+async def read_generation_status(
+    generation_id: uuid.UUID, session_factory: async_sessionmaker[AsyncSession] = SessionLocal
+) -> GenerationStatus | None:
+    """Read the current status of a generation, or None if it was deleted."""
+
+    async with session_factory() as session:
+        generation_orm = await session.get(GenerationORM, generation_id)
+    return GenerationStatus.model_validate(generation_orm) if generation_orm else None
+
+
+async def generation_status_events(generation_id: uuid.UUID, user_id: uuid.UUID) -> AsyncIterator[str]:
+    """
+    Yield server-sent events for each status change of a generation until it completes or fails,
+    for at most `EVENTS_MAX_DURATION` seconds.
+    The in-memory broker does not get the changes made by the worker processes, so the generation is then read
+    every `EVENTS_POLL_INTERVAL` seconds. Redis delivers them, and is only backed by a read every
+    `EVENTS_SAFETY_POLL_INTERVAL` seconds. These reads go to the replica when it is usable.
+    """
+
+    if settings.STATE_BACKEND == "memory":
+        poll_interval = settings.EVENTS_POLL_INTERVAL
+    else:
+        poll_interval = settings.EVENTS_SAFETY_POLL_INTERVAL
+    deadline = time.monotonic() + settings.EVENTS_MAX_DURATION
+    async with event_broker.subscribe(generation_channel(user_id)) as subscription:
+        # Read the current status once subscribed, so no change can be missed in between
+        generation_status = await read_generation_status(generation_id)
+        if generation_status is None:
+            return
+
+        while True:
+            yield f"event: status\ndata: {generation_status.model_dump_json()}\n\n"
+            if generation_status.status in (Status.COMPLETED, Status.FAILED):
+                return
+
+            last_sent = last_read = time.monotonic()
+            while True:
+                now = time.monotonic()
+                if now >= deadline:
+                    return
+
+                if now - last_read >= poll_interval:
+                    current = await read_generation_status(generation_id, await get_read_session_factory())
+                    last_read = time.monotonic()
+                    if current is None:
+                        return
+                    if current.status != generation_status.status:
+                        generation_status = current
+                        break
+
+                if now - last_sent >= settings.EVENTS_HEARTBEAT_INTERVAL:
+                    yield ": keep-alive\n\n"
+                    last_sent = now
+
+                wake_up = min(last_read + poll_interval, last_sent + settings.EVENTS_HEARTBEAT_INTERVAL)
+                message = await subscription.get(timeout=max(min(wake_up, deadline) - time.monotonic(), 0))
+                if message is None:
+                    continue
+                published = GenerationStatus.model_validate_json(message)
+                if published.id == generation_id:
+                    generation_status = published
+                    break
+
+
+@router.get("/generations/{generation_id}/events", response_class=StreamingResponse)
+async def stream_generation_status(
+    generation_id: uuid.UUID,
+    claims: Annotated[SessionClaims, Depends(get_current_session)],
+    session: Annotated[AsyncSession, Depends(get_db)],
+) -> StreamingResponse:
+    """Stream the status changes of a specific generation as server-sent events."""
+
+    async with session.begin():
+        statement = select(GenerationORM.id).where(
+            GenerationORM.id == generation_id,
+            GenerationORM.user_id == claims.user_id,
+        )
+        result = await session.execute(statement)
+        if result.scalar_one_or_none() is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Generation not found")
+
+    return StreamingResponse(
+        generation_status_events(generation_id, claims.user_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# A job still works on these generations and holds their reserved credits
+IN_FLIGHT_STATUSES = (Status.PENDING, Status.IN_PROGRESS)
+
+
+async def delete_generations(session: AsyncSession, user_id: uuid.UUID, *conditions: Any) -> list[uuid.UUID]:
+    """
+    Delete the finished generations of a user matching `conditions` with a single statement.
+    Their objects are recorded in the deletion outbox in the same transaction and removed later by the workers.
+    Pending and running generations are left alone, since their job would fail without refunding them.
+    """
+
+    statement = (
+        delete(GenerationORM)
+        .where(GenerationORM.user_id == user_id, GenerationORM.status.not_in(IN_FLIGHT_STATUSES), *conditions)
+        .returning(
+            GenerationORM.id,
+            GenerationORM.filename,
+            GenerationORM.thumbnail_filename,
+            GenerationORM.preview_filename,
+        )
+    )
+    async with session.begin():
+        rows = (await session.execute(statement, execution_options={"synchronize_session": False})).all()
+        paths = [path for row in rows for path in (row.filename, row.thumbnail_filename, row.preview_filename) if path]
+        await schedule_object_deletions(session, paths)
+
+    if paths:
+        await signed_urls.invalidate(paths)
+        try:
+            await enqueue_object_sweep()
+        except Exception:
+            # The deletions stay in the outbox until the next sweep
+            logger.warning(
+                "Failed to enqueue the deletion of %d objects of user %s", len(paths), user_id, exc_info=True
+            )
+
+    return [row.id for row in rows]
+
+
+@router.delete("/generations", response_model=GenerationBulkDeleteResponse)
+async def delete_generations_bulk(
+    claims: Annotated[SessionClaims, Depends(get_current_session)],
+    response: Response,
+    session: Annotated[AsyncSession, Depends(get_db)],
+    ids: Annotated[list[uuid.UUID] | None, Query(max_length=settings.DELETE_BATCH_MAX_IDS)] = None,
+    status_filter: Annotated[Status | None, Query(alias="status")] = None,
+    older_than: Annotated[datetime | None, Query()] = None,
+) -> Any:
+    """
+    Delete several generations at once, selected by ID, by status and/or by creation date.
+    At least one filter is required; the filters given are combined.
+    Generations that are pending or in progress are not deleted.
+    """
+
+    conditions: list[Any] = []
+    if ids:
+        conditions.append(GenerationORM.id.in_(ids))
+    if status_filter:
+        conditions.append(GenerationORM.status == status_filter)
+    if older_than:
+        conditions.append(GenerationORM.created_at < older_than)
+
+    if not conditions:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="At least one of the ids, status or older_than parameters is required",
+        )
+
+    generation_ids = await delete_generations(session, claims.user_id, *conditions)
+    stick_to_primary(response)
+
+    return GenerationBulkDeleteResponse(
+        message=f"{len(generation_ids)} generations deleted",
+        generation_ids=generation_ids,
+    )
 
 
 @router.delete("/generations/{generation_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_generation(
     generation_id: uuid.UUID,
-    current_user: Annotated[UserORM, Depends(get_current_user)],
+    claims: Annotated[SessionClaims, Depends(get_current_session)],
+    response: Response,
     session: Annotated[AsyncSession, Depends(get_db)],
 ) -> None:
-    """Delete a specific generation by ID."""
+    """Delete a specific generation by ID, once it completed or failed."""
 
-    async with session.begin():
-        statement = select(GenerationORM).where(
+    if not await delete_generations(session, claims.user_id, GenerationORM.id == generation_id):
+        statement = select(GenerationORM.id).where(
             GenerationORM.id == generation_id,
-            GenerationORM.user_id == current_user.id,
+            GenerationORM.user_id == claims.user_id,
         )
-        result = await session.execute(statement)
-        generation_orm = result.scalars().one_or_none()
-
-        if not generation_orm:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Generation not found")
+        if await session.scalar(statement) is not None:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="The generation is still running and cannot be deleted yet",
+            )
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Generation not found")
 
-        await session.delete(generation_orm)
-        if generation_orm.filename:
-            await obs.delete_async(store, generation_orm.filename)
+    stick_to_primary(response)
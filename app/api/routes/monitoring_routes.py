@@ -0,0 +1,31 @@
+from typing import Any
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import Response
+
+from app.api.deps import require_monitoring_token
+from app.core.metrics import GENERATION_QUEUE_DEPTH, render_metrics
+from app.db.config import get_pool_stats
+from app.dramatiq_app import get_queue_depth
+from app.schemas.monitoring import DBPoolStats
+
+# Monitoring exposes traffic and internals, so it is only served to the holders of `MONITORING_TOKEN`
+router = APIRouter(dependencies=[Depends(require_monitoring_token)])
+
+
+@router.get("/monitoring/db-pool", response_model=DBPoolStats)
+async def get_db_pool_stats() -> Any:
+    """
+    Retrieve the connection pool usage of the process serving the request.
+    Checkout wait times are in seconds and cumulative since the process started.
+    """
+    return DBPoolStats.model_validate(get_pool_stats())
+
+
+@router.get("/metrics", response_class=Response)
+async def get_metrics() -> Response:
+    """Expose the metrics of all the processes in the Prometheus text format."""
+
+    GENERATION_QUEUE_DEPTH.set(await get_queue_depth())
+    content, content_type = render_metrics()
+    return Response(content=content, media_type=content_type)
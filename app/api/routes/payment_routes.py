@@ -1,19 +1,24 @@
+import logging
 from typing import Annotated, Any
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.responses import RedirectResponse
-from sqlalchemy import select
+from pydantic import ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.deps import get_current_user, get_db
 from app.config import get_settings
+from app.core.payments import LEMONSQUEEZY, record_payment, verify_lemonsqueezy_signature
 from app.core.products import Units, get_product_by_name, get_product_by_units
 from app.db.models import UserORM
-from app.schemas.lemonsqueezy import OrderResponse
+from app.dramatiq_app import enqueue_payments
+from app.schemas.lemonsqueezy import OrderCallback
 from app.schemas.shared import MessageResponse
 
 settings = get_settings()
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 
@@ -38,16 +43,31 @@ async def credit_user_account(
 
 @router.post("/lemonsqueeze/callback", response_model=MessageResponse)
 async def lemonsqueezy_callback(
-    data: Annotated[OrderResponse, Depends()],
+    request: Request,
     session: Annotated[AsyncSession, Depends(get_db)],
 ) -> Any:
-    """Handle callback from LemonSqueeze payment provider."""
+    """
+    Handle callback from LemonSqueeze payment provider.
+    The order is only recorded here, once per identifier, and the workers credit the account.
+    """
+
+    if not settings.LEMONSQUEEZY_SECRET_KEY:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="LemonSqueezy webhooks are not enabled")
 
-    user_email = data.data.attributes.user_email
-    status = data.data.attributes.status
-    product_name = data.data.attributes.first_order_item.product_name
+    body = await request.body()
+    if not verify_lemonsqueezy_signature(
+        body, request.headers.get("X-Signature", ""), settings.LEMONSQUEEZY_SECRET_KEY
+    ):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid webhook signature")
 
-    product = get_product_by_name(product_name)
+    try:
+        data = OrderCallback.model_validate_json(body)
+    except ValidationError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid order payload")
+
+    attributes = data.data.attributes
+    user_email = attributes.user_email
+    product = get_product_by_name(attributes.first_order_item.product_name)
 
     if not user_email:
         return {
@@ -55,23 +75,33 @@ async def lemonsqueezy_callback(
             "error": "User email not found in callback data",
         }
 
-    if status != "paid":
+    if attributes.status != "paid":
         return {
             "message": "Payment not successful",
-            "error": f"Payment status is {status}, expected 'paid'",
+            "error": f"Payment status is {attributes.status}, expected 'paid'",
         }
 
-    async with session.begin():
-        statement = select(UserORM).where(UserORM.email == user_email)
-        result = await session.execute(statement)
-        user_orm = result.scalars().one_or_none()
+    if product is None:
+        logger.warning(
+            "Unknown product %s in order %s", attributes.first_order_item.product_name, attributes.identifier
+        )
+        return {
+            "message": "Unknown product",
+            "error": f"No product named {attributes.first_order_item.product_name}",
+        }
 
-        if not user_orm:
-            return {
-                "message": "User not found",
-                "error": f"No user found with email: {user_email}",
-            }
+    recorded = await record_payment(session, LEMONSQUEEZY, attributes.identifier, user_email, product["units"])
 
-        user_orm.credits += product["units"]
+    # A redelivered order is enqueued again, in case the job of its first delivery was lost
+    try:
+        await enqueue_payments()
+    except Exception:
+        logger.warning("Failed to enqueue the payment of order %s", attributes.identifier, exc_info=True)
+        # The payment stays recorded; a failed response makes LemonSqueezy deliver it again
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="The payment could not be processed yet"
+        )
 
-    return {"message": "Payment processed successfully"}
+    if not recorded:
+        return {"message": "Payment already processed"}
+    return {"message": "Payment received"}
@@ -0,0 +1,60 @@
+import asyncio
+import uuid
+from typing import Annotated, Any
+
+from fastapi import APIRouter, HTTPException, Query, Request, status
+from pydantic import ValidationError
+
+from app.config import get_settings
+from app.dramatiq_app import complete_prediction
+from app.schemas.replicate import PredictionWebhook
+from app.schemas.shared import MessageResponse
+
+settings = get_settings()
+
+router = APIRouter()
+
+WEBHOOK_TOLERANCE = 300
+"""The maximum age in seconds of a webhook call, to limit replays."""
+
+
+@router.post("/replicate/webhook", response_model=MessageResponse)
+async def replicate_webhook(
+    request: Request,
+    generation_id: Annotated[uuid.UUID, Query()],
+) -> Any:
+    """Hand the outcome of a prediction over to the workers when Replicate reports it."""
+
+    if not settings.REPLICATE_WEBHOOK_SECRET:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Replicate webhooks are not enabled")
+
+    # Imported here since the Replicate client is slow to import and only the workers need the rest of it
+    from replicate.webhook import Webhooks, WebhookSigningSecret, WebhookValidationError
+
+    body = (await request.body()).decode()
+    try:
+        Webhooks.validate(
+            headers=dict(request.headers),
+            body=body,
+            secret=WebhookSigningSecret(key=settings.REPLICATE_WEBHOOK_SECRET),
+            tolerance=WEBHOOK_TOLERANCE,
+        )
+    except (WebhookValidationError, ValueError):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid webhook signature")
+
+    try:
+        prediction = PredictionWebhook.model_validate_json(body)
+    except ValidationError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid prediction payload")
+
+    if prediction.status not in ("succeeded", "failed", "canceled"):
+        return {"message": "Prediction is not finished"}
+
+    error = None
+    if prediction.status != "succeeded":
+        error = prediction.error or f"The prediction was {prediction.status}"
+
+    # Broker calls are blocking, so they run in a thread
+    await asyncio.to_thread(complete_prediction.send, str(generation_id), prediction.id, prediction.output_url, error)
+
+    return {"message": "Prediction received"}
@@ -41,7 +41,31 @@ class Settings(BaseSettings):
     """The root directory of the application, used for file paths."""
 
     SECRET_KEY: str = secrets.token_urlsafe(32)
-    """The secret key used for encoding and decoding JWT tokens."""
+    """
+    The secret key used for signing session tokens. Must be shared by all the replicas and kept across restarts,
+    so it is required outside of the local environment; a random one is only generated for local runs.
+    """
+
+    @model_validator(mode="after")
+    def _check_secret_key(self) -> Self:
+        if self.ENVIRONMENT != "local" and (
+            "SECRET_KEY" not in self.model_fields_set or self.SECRET_KEY == "changethis"
+        ):
+            raise ValueError("SECRET_KEY must be set outside of the local environment")
+        return self
+
+    SESSION_COOKIE_NAME: str = "session"
+    """The name of the cookie holding the session token."""
+    SESSION_TOKEN_EXPIRES_IN: int = 3600
+    """The lifetime in seconds of a session token. Tokens are renewed once half of it has elapsed."""
+
+    MONITORING_TOKEN: str | None = None
+    """The bearer token required by `/metrics` and `/monitoring/*`; they are not served without it."""
+
+    USER_CACHE_TTL: int = 5
+    """The number of seconds a user loaded from the database is reused by the same process."""
+    USER_CACHE_SIZE: int = 10_000
+    """The maximum number of users kept in memory by each process."""
 
     FRONTEND_HOST: str = "http://localhost:5173"
     """The host for the frontend application, used for emails and redirects."""
@@ -91,6 +115,47 @@ class Settings(BaseSettings):
             path=self.POSTGRES_DATABASE,
         )
 
+    POSTGRES_REPLICA_SERVER: str | None = None
+    """The server address of a read replica with the same credentials; reads use the primary if unset."""
+    POSTGRES_REPLICA_PORT: int | None = None
+    """The port of the read replica, defaults to `POSTGRES_PORT`."""
+
+    @computed_field  # type: ignore[prop-decorator]
+    @property
+    def SQLALCHEMY_REPLICA_DATABASE_URI(self) -> MultiHostUrl | None:
+        if not self.POSTGRES_REPLICA_SERVER:
+            return None
+        return MultiHostUrl.build(
+            scheme="postgresql+asyncpg",
+            username=self.POSTGRES_USER,
+            password=self.POSTGRES_PASSWORD,
+            host=self.POSTGRES_REPLICA_SERVER,
+            port=self.POSTGRES_REPLICA_PORT or self.POSTGRES_PORT,
+            path=self.POSTGRES_DATABASE,
+        )
+
+    REPLICA_MAX_LAG: float = 2
+    """The replication lag in seconds above which reads go to the primary."""
+    REPLICA_LAG_CHECK_INTERVAL: float = 5
+    """The number of seconds between two checks of the replication lag."""
+    READ_YOUR_WRITES_WINDOW: int = 5
+    """The number of seconds during which a user's reads go to the primary after they changed data."""
+
+    DB_POOL_SIZE: int = 5
+    """The number of connections kept open by each process; size web and worker processes separately."""
+    DB_MAX_OVERFLOW: int = 10
+    """The number of connections opened beyond `DB_POOL_SIZE` under load, closed once returned."""
+    DB_POOL_TIMEOUT: float = 30
+    """The number of seconds to wait for a free connection before failing."""
+    DB_POOL_RECYCLE: int = 1800
+    """The age in seconds after which a connection is replaced, before the server or a proxy drops it."""
+    DB_POOL_PRE_PING: bool = True
+    """Whether connections are checked before use, to replace those dropped while idle."""
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    """The number of prepared statements cached by each connection."""
+    DB_PGBOUNCER: bool = False
+    """Whether the database is reached through pgbouncer in transaction mode, which cannot keep prepared statements."""
+
     # The API key for the Resend service
     RESEND_API_KEY: str | None = None
     """The API key for the Resend service, used for sending emails."""
@@ -107,6 +172,44 @@ class Settings(BaseSettings):
     REPLICATE_MODEL_ID: str = "black-forest-labs/flux-schnell"
     """The ID of the Replicate model to use for image generation."""
 
+    REPLICATE_GLOBAL_CONCURRENCY: int = 64
+    """The maximum number of Replicate predictions running at once, all models combined."""
+    REPLICATE_CONCURRENCY_INITIAL: int = 4
+    """The concurrency limit a model starts with before it adapts to the upstream signals."""
+    REPLICATE_CONCURRENCY_MIN: int = 1
+    """The lowest concurrency limit a model can be throttled down to."""
+    REPLICATE_CONCURRENCY_MAX: int = 32
+    """The highest concurrency limit a model can grow up to."""
+    REPLICATE_MODEL_CONCURRENCY: dict[str, int] = {}
+    """Per-model overrides of `REPLICATE_CONCURRENCY_MAX`, as a JSON object."""
+    REPLICATE_BACKOFF_FACTOR: float = 0.5
+    """The factor applied to a model's concurrency limit when Replicate throttles it."""
+    REPLICATE_LATENCY_TARGET: float | None = None
+    """The prediction duration in seconds above which a model's concurrency limit is lowered."""
+    REPLICATE_LEASE_TIMEOUT: int = 600
+    """The number of seconds after which a concurrency slot held by a crashed worker is recovered."""
+    REPLICATE_WEBHOOKS_ENABLED: bool = False
+    """Whether workers only start predictions and let the Replicate webhook complete the generations."""
+    REPLICATE_WEBHOOK_SECRET: str | None = None
+    """The signing secret of the Replicate webhooks (`whsec_...`), required to accept their calls."""
+    REPLICATE_WEBHOOK_DEADLINE: int = 600
+    """The number of seconds after its start after which a prediction is polled, in case its webhook was lost."""
+    REPLICATE_PREDICTION_TIMEOUT: int = 3600
+    """The number of seconds after its start after which a prediction still running is canceled and refunded."""
+
+    @model_validator(mode="after")
+    def _check_replicate_webhooks(self) -> Self:
+        if self.REPLICATE_WEBHOOKS_ENABLED and not self.REPLICATE_WEBHOOK_SECRET:
+            raise ValueError("REPLICATE_WEBHOOK_SECRET is required when REPLICATE_WEBHOOKS_ENABLED is set")
+        return self
+
+    RESULT_CACHE_ENABLED: bool = False
+    """Whether identical generation requests reuse a stored output instead of running the model again."""
+    RESULT_CACHE_TTL: int = 7 * 24 * 3600
+    """The number of seconds an unused output stays in the result cache."""
+    RESULT_CACHE_SIZE: int = 10_000
+    """The maximum number of outputs kept in the in-memory result cache of each process."""
+
     GOOGLE_OAUTH2_CLIENT_ID: str = "your-google-client-id"
     """Google OAuth2 client ID for authentication."""
     GOOGLE_OAUTH2_CLIENT_SECRET: str = "your-google-client-secret"
@@ -123,6 +226,38 @@ class Settings(BaseSettings):
     S3_BUCKET_ENDPOINT: str = "https://s3.example.com"
     """The endpoint URL for the S3 storage, e.g., https://s3.example.com"""
 
+    STORAGE_BACKEND: Literal["s3", "memory"] = "s3"
+    """Where objects are stored. `memory` keeps them in the process, for tests and local runs."""
+
+    UPLOAD_CHUNK_SIZE: int = 5 * 1024 * 1024
+    """The part size in bytes of multipart uploads to S3 (5 MiB minimum for S3)."""
+    UPLOAD_MAX_CONCURRENCY: int = 2
+    """The number of parts of a single multipart upload sent concurrently."""
+
+    IMAGE_PROCESS_WORKERS: int | None = None
+    """The number of processes resizing and encoding images, defaults to the number of CPUs."""
+    IMAGE_QUALITY: int = 90
+    """The encoder quality of stored JPEG outputs, from 0 to 100, also requested from the models that take it."""
+    IMAGE_COMPRESSION_EFFORT: int = 6
+    """The PNG compression level of transcoded outputs, from 0 (fastest) to 9 (smallest)."""
+    THUMBNAIL_SIZE: int = 256
+    """The longest side in pixels of the thumbnails shown in the generation lists."""
+    PREVIEW_SIZE: int = 1024
+    """The longest side in pixels of the previews shown for a single generation."""
+    THUMBNAIL_FORMAT: Literal["webp", "avif"] = "webp"
+    """The format of the thumbnails and previews; AVIF requires Pillow built with libavif."""
+    THUMBNAIL_QUALITY: int = 75
+    """The encoder quality of the thumbnails and previews, from 0 to 100."""
+    THUMBNAIL_MAX_SOURCE_SIZE: int = 32 * 1024 * 1024
+    """The size in bytes above which an output gets no thumbnail and preview, to bound the memory of a job."""
+
+    SIGNED_URL_EXPIRES_IN: int = 900
+    """The lifetime in seconds of the presigned URLs handed to clients."""
+    SIGNED_URL_SAFETY_MARGIN: int = 300
+    """The minimum remaining lifetime in seconds for a cached presigned URL to be reused."""
+    SIGNED_URL_CACHE_SIZE: int = 10_000
+    """The maximum number of presigned URLs kept in memory by each process."""
+
     @computed_field  # type: ignore[prop-decorator]
     @property
     def S3_BUCKET_URL(self) -> str:
@@ -136,6 +271,44 @@ class Settings(BaseSettings):
     """The host for the Redis server."""
     REDIS_PORT: int = 6379
     """The port for the Redis server."""
+    REDIS_DB: int = 0
+    """The Redis database index."""
+
+    @computed_field  # type: ignore[prop-decorator]
+    @property
+    def REDIS_URL(self) -> str:
+        return f"redis://{self.REDIS_HOST}:{self.REDIS_PORT}/{self.REDIS_DB}"
+
+    STATE_BACKEND: Literal["memory", "redis"] = "memory"
+    """Where state shared between processes (caches, pub/sub) lives. Use `redis` when running several processes."""
+
+    EVENTS_HEARTBEAT_INTERVAL: int = 15
+    """The number of seconds between keep-alive comments on idle event streams."""
+    EVENTS_POLL_INTERVAL: float = 5
+    """
+    The number of seconds between two reads of the generation by an event stream with the `memory` state backend,
+    which does not get the changes made by the worker processes.
+    """
+    EVENTS_SAFETY_POLL_INTERVAL: float = 120
+    """The number of seconds between two reads of the generation by an event stream with Redis, for lost messages."""
+    EVENTS_MAX_DURATION: int = 600
+    """The number of seconds after which an event stream is closed; clients reconnect to keep listening."""
+
+    TASK_BROKER: Literal["redis", "stub"] = "redis"
+    """The broker used by background workers. `stub` keeps messages in memory, for tests and local runs."""
+    WORKER_PROCESSES: int = 1
+    """The number of worker processes started by `python -m app.worker`."""
+    WORKER_THREADS: int = 4
+    """The number of worker threads per process started by `python -m app.worker`."""
+
+    GENERATION_MAX_RETRIES: int = 3
+    """The number of times a failed generation job is retried before it is marked as failed."""
+    GENERATION_MIN_BACKOFF_MS: int = 5_000
+    """The minimum delay in milliseconds before a failed generation job is retried."""
+    GENERATION_MAX_BACKOFF_MS: int = 300_000
+    """The maximum delay in milliseconds before a failed generation job is retried."""
+    GENERATION_TIME_LIMIT_MS: int = 600_000
+    """The maximum time in milliseconds a single generation job may run."""
 
     @model_validator(mode="after")
     def _set_default_emails_from(self) -> Self:
@@ -143,9 +316,40 @@ class Settings(BaseSettings):
             self.EMAILS_FROM_NAME = self.PROJECT_NAME
         return self
 
+    LEMONSQUEEZY_SECRET_KEY: str | None = None
+    """The signing secret of the LemonSqueezy webhook; callbacks are rejected without it or a valid `X-Signature`."""
+    PAYMENT_BATCH_SIZE: int = 500
+    """The number of recorded payment events whose credits are applied in a single transaction."""
+    PAYMENT_MAX_RETRIES: int = 10
+    """The number of times a failed payment job is retried; the payments left are credited by the next job."""
+
     GENERATION_COST: int = 10
     """The number of credits deducted per image generation."""
 
+    GENERATION_BATCH_MAX_ITEMS: int = 500
+    """The maximum number of generations created by a single batch request."""
+    GENERATION_DISPATCH_CONCURRENCY: int = 16
+    """The maximum number of jobs of a batch handed to the broker concurrently."""
+
+    STATUS_BATCH_MAX_IDS: int = 200
+    """The maximum number of generations whose status can be requested at once."""
+    DELETE_BATCH_MAX_IDS: int = 1000
+    """The maximum number of generation IDs a single bulk delete request can list."""
+    STORAGE_DELETE_BATCH_SIZE: int = 1000
+    """The number of objects removed by each bulk delete call to the store."""
+    OBJECT_GC_BATCH_SIZE: int = 10_000
+    """The number of pending object deletions claimed by each round of the sweeper."""
+    OBJECT_GC_CONCURRENCY: int = 4
+    """The number of bulk delete calls the sweeper sends to the store concurrently."""
+    OBJECT_GC_LEASE: int = 600
+    """The seconds a claimed deletion is hidden from other sweepers, after which a crashed sweep is retried."""
+    OBJECT_GC_MIN_BACKOFF: int = 60
+    """The delay in seconds before a failed object deletion is retried, doubled on each failure."""
+    OBJECT_GC_MAX_BACKOFF: int = 6 * 3600
+    """The maximum delay in seconds before a failed object deletion is retried."""
+    OBJECT_GC_GRACE_PERIOD: int = 24 * 3600
+    """The age in seconds below which unreferenced objects are left alone, as they may belong to running jobs."""
+
     @property
     @computed_field
     def emails_enabled(self) -> bool:
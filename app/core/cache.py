@@ -0,0 +1,47 @@
+import time
+from collections import OrderedDict
+
+
+class LRUCache[K, V]:
+    """
+    A small in-process LRU cache where each entry has its own expiry.
+    Expiries are wall-clock timestamps so they can be shared with other processes.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._entries: OrderedDict[K, tuple[V, float]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: K, min_ttl: float = 0) -> V | None:
+        """Return the value for `key` if it is still valid for at least `min_ttl` seconds."""
+
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        value, expires_at = entry
+        if expires_at - time.time() <= min_ttl:
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: K, value: V, expires_at: float) -> None:
+        """Store `value` for `key` until `expires_at`, evicting the least recently used entries."""
+
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: K) -> None:
+        """Remove `key` from the cache if present."""
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """Remove all entries from the cache."""
+        self._entries.clear()
@@ -0,0 +1,78 @@
+import uuid
+
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.metrics import CREDITS
+from app.core.users import invalidate_user_on_commit
+from app.db.models import CreditLedgerORM, CreditReason, UserORM
+
+
+class InsufficientCreditsError(Exception):
+    """Custom exception for users who do not have enough credits."""
+
+
+async def _apply(
+    session: AsyncSession,
+    user_id: uuid.UUID,
+    amount: int,
+    reason: CreditReason,
+    generation_id: uuid.UUID | None = None,
+    reference: str | None = None,
+) -> int | None:
+    """
+    Change the credit balance of a user in a single statement and record it in the ledger.
+    Debits only apply when the balance covers them. Returns the new balance, or None if
+    nothing was changed.
+    """
+
+    statement = update(UserORM).where(UserORM.id == user_id)
+    if amount < 0:
+        statement = statement.where(UserORM.credits >= -amount)
+    statement = statement.values(credits=UserORM.credits + amount).returning(UserORM.credits)
+
+    result = await session.execute(statement)
+    balance = result.scalar_one_or_none()
+    if balance is None:
+        return None
+
+    session.add(
+        CreditLedgerORM(
+            user_id=user_id,
+            generation_id=generation_id,
+            amount=amount,
+            balance=balance,
+            reason=reason,
+            reference=reference,
+        )
+    )
+    invalidate_user_on_commit(session, user_id)
+    CREDITS.labels(reason).inc(abs(amount))
+    return balance
+
+
+async def reserve_credits(
+    session: AsyncSession,
+    user_id: uuid.UUID,
+    amount: int,
+    generation_id: uuid.UUID | None = None,
+    reference: str | None = None,
+) -> int:
+    """Reserve the credits of one or more generations, failing if the user cannot afford them."""
+
+    balance = await _apply(
+        session, user_id, -amount, CreditReason.GENERATION, generation_id=generation_id, reference=reference
+    )
+    if balance is None:
+        raise InsufficientCreditsError(f"User {user_id} does not have {amount} credits")
+    return balance
+
+
+async def refund_credits(session: AsyncSession, user_id: uuid.UUID, amount: int, generation_id: uuid.UUID) -> None:
+    """Give back the credits reserved by a generation that failed."""
+    await _apply(session, user_id, amount, CreditReason.REFUND, generation_id=generation_id)
+
+
+async def add_credits(session: AsyncSession, user_id: uuid.UUID, amount: int, reference: str | None = None) -> None:
+    """Credit a user's account after a purchase."""
+    await _apply(session, user_id, amount, CreditReason.PURCHASE, reference=reference)
@@ -0,0 +1,38 @@
+import hashlib
+from typing import Any
+
+from starlette.responses import Response
+
+
+def make_etag(*parts: Any) -> str:
+    """Build a strong ETag from the values that determine a response body."""
+
+    digest = hashlib.sha256("|".join(str(part) for part in parts).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Check an `If-None-Match` request header against the current ETag of a resource."""
+
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (candidate.strip().removeprefix("W/") for candidate in if_none_match.split(","))
+    return etag in candidates
+
+
+CACHE_CONTROL = "private, no-cache"
+"""Let clients keep responses but revalidate them on every use."""
+
+
+def set_etag(response: Response, etag: str) -> None:
+    """Add the validator and caching headers to a full response."""
+
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+
+
+def not_modified(etag: str) -> Response:
+    """Build the 304 response telling the client its copy is still current."""
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
@@ -0,0 +1,107 @@
+import asyncio
+import logging
+import uuid
+from collections import defaultdict
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from typing import Protocol
+
+from redis.asyncio.client import PubSub
+from redis.exceptions import RedisError
+
+from app.config import get_settings
+from app.core.redis import get_redis
+from app.schemas.generations import GenerationStatus
+
+settings = get_settings()
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription(Protocol):
+    async def get(self, timeout: float) -> str | None:
+        """Wait at most `timeout` seconds for the next message."""
+        ...
+
+
+class _QueueSubscription:
+    def __init__(self, queue: asyncio.Queue[str]) -> None:
+        self.queue = queue
+
+    async def get(self, timeout: float) -> str | None:
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except TimeoutError:
+            return None
+
+
+class InMemoryEventBroker:
+    """Event broker for a single process, used for local runs and tests."""
+
+    def __init__(self) -> None:
+        self._queues: defaultdict[str, set[asyncio.Queue[str]]] = defaultdict(set)
+
+    async def publish(self, channel: str, message: str) -> None:
+        """Send a message to all the subscribers of a channel."""
+        for queue in self._queues.get(channel, ()):
+            queue.put_nowait(message)
+
+    @asynccontextmanager
+    async def subscribe(self, channel: str) -> AsyncIterator[Subscription]:
+        """Listen to the messages of a channel for the duration of the context."""
+        queue: asyncio.Queue[str] = asyncio.Queue()
+        self._queues[channel].add(queue)
+        try:
+            yield _QueueSubscription(queue)
+        finally:
+            self._queues[channel].discard(queue)
+            if not self._queues[channel]:
+                del self._queues[channel]
+
+
+class _PubSubSubscription:
+    def __init__(self, pubsub: PubSub) -> None:
+        self.pubsub = pubsub
+
+    async def get(self, timeout: float) -> str | None:
+        message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+        if message is None:
+            return None
+        data = message["data"]
+        return data.decode() if isinstance(data, bytes) else str(data)
+
+
+class RedisEventBroker:
+    """Event broker fanning messages out to every process through Redis pub/sub."""
+
+    async def publish(self, channel: str, message: str) -> None:
+        await get_redis().publish(channel, message)
+
+    @asynccontextmanager
+    async def subscribe(self, channel: str) -> AsyncIterator[Subscription]:
+        pubsub = get_redis().pubsub()
+        await pubsub.subscribe(channel)
+        try:
+            yield _PubSubSubscription(pubsub)
+        finally:
+            await pubsub.unsubscribe(channel)
+            await pubsub.aclose()  # type: ignore[no-untyped-call]
+
+
+event_broker: InMemoryEventBroker | RedisEventBroker = (
+    RedisEventBroker() if settings.STATE_BACKEND == "redis" else InMemoryEventBroker()
+)
+
+
+def generation_channel(user_id: uuid.UUID) -> str:
+    """Return the channel on which the status changes of a user's generations are published."""
+    return f"generations:{user_id}"
+
+
+async def publish_generation_status(user_id: uuid.UUID, generation_status: GenerationStatus) -> None:
+    """Notify the listeners of a status change, without failing the caller if the broker is down."""
+
+    try:
+        await event_broker.publish(generation_channel(user_id), generation_status.model_dump_json())
+    except RedisError:
+        logger.warning("Failed to publish the status of generation %s", generation_status.id, exc_info=True)
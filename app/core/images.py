@@ -0,0 +1,115 @@
+import asyncio
+import io
+import multiprocessing
+from collections.abc import Buffer
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any
+
+from PIL import Image
+
+from app.config import get_settings
+
+settings = get_settings()
+
+_executor: ProcessPoolExecutor | None = None
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """
+    Get the pool of processes doing the CPU-bound image work, off the event loop and the GIL.
+    The processes are spawned rather than forked since the workers run threads.
+    """
+
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.IMAGE_PROCESS_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+@dataclass(frozen=True)
+class Derivative:
+    """A resized copy of an image, encoded for display."""
+
+    name: str
+    data: bytes
+    content_type: str
+
+
+def _encode(image: Image.Image, max_size: int, image_format: str, quality: int) -> bytes:
+    resized = image.copy()
+    resized.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+    buffer = io.BytesIO()
+    resized.save(buffer, format=image_format.upper(), quality=quality)
+    return buffer.getvalue()
+
+
+def make_derivatives(data: Buffer, sizes: dict[str, int], image_format: str, quality: int) -> list[Derivative]:
+    """Resize an encoded image to each of the named `sizes`. Runs in the process pool."""
+
+    with Image.open(io.BytesIO(data)) as source:
+        source.load()
+        image: Image.Image = source
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+        return [
+            Derivative(name, _encode(image, size, image_format, quality), f"image/{image_format}")
+            for name, size in sizes.items()
+        ]
+
+
+PIL_FORMATS = {"jpg": "JPEG", "png": "PNG", "webp": "WEBP", "avif": "AVIF"}
+
+
+def transcode(data: bytes, ratio: str, image_format: str, quality: int, compression_effort: int) -> bytes:
+    """
+    Center-crop an encoded image to `ratio` (such as "16:9") and encode it to `image_format`.
+    Runs in the process pool.
+    """
+
+    width_ratio, height_ratio = (int(part) for part in ratio.split(":"))
+
+    with Image.open(io.BytesIO(data)) as source:
+        source.load()
+        width, height = source.size
+        target_width = min(width, round(height * width_ratio / height_ratio))
+        target_height = min(height, round(width * height_ratio / width_ratio))
+        left = (width - target_width) // 2
+        top = (height - target_height) // 2
+        image: Image.Image = source.crop((left, top, left + target_width, top + target_height))
+
+        pil_format = PIL_FORMATS[image_format]
+        if pil_format == "JPEG" and image.mode != "RGB":
+            image = image.convert("RGB")
+
+        options: dict[str, Any] = {"quality": quality}
+        if pil_format == "JPEG":
+            options["optimize"] = True
+        elif pil_format == "PNG":
+            options = {"compress_level": compression_effort}
+
+        buffer = io.BytesIO()
+        image.save(buffer, format=pil_format, **options)
+        return buffer.getvalue()
+
+
+async def transcode_image(data: bytes, ratio: str, image_format: str) -> bytes:
+    """Crop and encode an image to the requested ratio and format in the process pool."""
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_executor(), transcode, data, ratio, image_format, settings.IMAGE_QUALITY, settings.IMAGE_COMPRESSION_EFFORT
+    )
+
+
+async def create_derivatives(data: Buffer) -> list[Derivative]:
+    """Create the thumbnail and the preview of an image in the process pool."""
+
+    sizes = {"thumbnail": settings.THUMBNAIL_SIZE, "preview": settings.PREVIEW_SIZE}
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_executor(), make_derivatives, data, sizes, settings.THUMBNAIL_FORMAT, settings.THUMBNAIL_QUALITY
+    )
@@ -0,0 +1,312 @@
+import asyncio
+import logging
+import random
+import time
+import uuid
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any
+
+import replicate
+from replicate.exceptions import ReplicateError
+from replicate.prediction import Prediction
+
+from app.config import get_settings
+from app.core.metrics import REPLICATE_REQUEST_DURATION, REPLICATE_REQUESTS
+from app.core.redis import get_redis
+
+settings = get_settings()
+
+logger = logging.getLogger(__name__)
+
+
+class PredictionFailedError(Exception):
+    """Custom exception for predictions that failed or were canceled on Replicate."""
+
+
+@dataclass(frozen=True)
+class ModelCapabilities:
+    """The inputs a Replicate model takes to shape its output; anything else is done by the worker."""
+
+    aspect_ratios: frozenset[str] = frozenset()
+    output_formats: frozenset[str] = frozenset()
+    output_quality: bool = False
+
+
+FLUX_CAPABILITIES = ModelCapabilities(
+    aspect_ratios=frozenset({"1:1", "16:9", "21:9", "3:2", "2:3", "4:5", "5:4", "3:4", "4:3", "9:16", "9:21"}),
+    output_formats=frozenset({"webp", "jpg", "png"}),
+    output_quality=True,
+)
+
+MODEL_CAPABILITIES: dict[str, ModelCapabilities] = {
+    "black-forest-labs/flux-schnell": FLUX_CAPABILITIES,
+    "black-forest-labs/flux-dev": FLUX_CAPABILITIES,
+    "black-forest-labs/flux-1.1-pro": FLUX_CAPABILITIES,
+}
+
+
+def get_model_capabilities(model_id: str) -> ModelCapabilities:
+    """Get the output options a model supports, none for unknown models."""
+    return MODEL_CAPABILITIES.get(model_id, ModelCapabilities())
+
+
+@dataclass(frozen=True)
+class LimiterStats:
+    """Snapshot of a concurrency limiter, for monitoring."""
+
+    limit: float
+    in_flight: int
+    waiting: int
+
+
+class LocalLimiter:
+    """
+    Concurrency limiter for a single process with AIMD adaptation.
+
+    The limit grows by about one slot per `limit` successful calls and is multiplied by
+    `backoff_factor` when the upstream throttles. With `minimum == maximum` it is a plain semaphore.
+    """
+
+    def __init__(self, name: str, initial: int, minimum: int, maximum: int, backoff_factor: float) -> None:
+        self.name = name
+        self.minimum = minimum
+        self.maximum = maximum
+        self.backoff_factor = backoff_factor
+        self.limit = float(min(max(initial, minimum), maximum))
+        self.in_flight = 0
+        self.waiting = 0
+        self._condition = asyncio.Condition()
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Hold one of the slots for the duration of the context."""
+
+        async with self._condition:
+            self.waiting += 1
+            try:
+                await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            finally:
+                self.waiting -= 1
+            self.in_flight += 1
+
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self.in_flight -= 1
+                self._condition.notify_all()
+
+    async def increase(self) -> None:
+        async with self._condition:
+            self.limit = min(self.limit + 1 / self.limit, self.maximum)
+            self._condition.notify_all()
+
+    async def decrease(self) -> None:
+        self.limit = max(self.limit * self.backoff_factor, self.minimum)
+        logger.info("Concurrency limit of %s lowered to %.1f", self.name, self.limit)
+
+    async def stats(self) -> LimiterStats:
+        return LimiterStats(limit=self.limit, in_flight=self.in_flight, waiting=self.waiting)
+
+
+# Drops expired leases and takes a new one if the limit allows it.
+ACQUIRE_SCRIPT = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+local limit = tonumber(redis.call('GET', KEYS[2]) or ARGV[4])
+if redis.call('ZCARD', KEYS[1]) < math.floor(limit) then
+    redis.call('ZADD', KEYS[1], ARGV[2], ARGV[3])
+    return 1
+end
+return 0
+"""
+
+# Sets the shared limit to min(max(f(limit), minimum), maximum) with f(x) = x * ARGV[1] + ARGV[2] / x.
+ADJUST_SCRIPT = """
+local limit = tonumber(redis.call('GET', KEYS[1]) or ARGV[3])
+limit = limit * tonumber(ARGV[1]) + tonumber(ARGV[2]) / limit
+limit = math.min(math.max(limit, tonumber(ARGV[4])), tonumber(ARGV[5]))
+redis.call('SET', KEYS[1], limit)
+return tostring(limit)
+"""
+
+
+class RedisLimiter:
+    """
+    Concurrency limiter shared by all the processes through Redis, with AIMD adaptation.
+
+    Each call holds a lease in a sorted set until it ends. Leases expire after `lease_timeout`
+    seconds so slots held by crashed workers are eventually recovered.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial: int,
+        minimum: int,
+        maximum: int,
+        backoff_factor: float,
+        lease_timeout: int,
+    ) -> None:
+        self.name = name
+        self.initial = min(max(initial, minimum), maximum)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.backoff_factor = backoff_factor
+        self.lease_timeout = lease_timeout
+        self.leases_key = f"limiter:{name}:leases"
+        self.limit_key = f"limiter:{name}:limit"
+        self.waiting_key = f"limiter:{name}:waiting"
+        self._acquire_script = get_redis().register_script(ACQUIRE_SCRIPT)
+        self._adjust_script = get_redis().register_script(ADJUST_SCRIPT)
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Hold one of the slots for the duration of the context."""
+
+        lease = uuid.uuid4().hex
+        delay = 0.05
+        await get_redis().incr(self.waiting_key)
+        try:
+            while True:
+                now = time.time()
+                keys = [self.leases_key, self.limit_key]
+                args: list[str | int | float] = [now, now + self.lease_timeout, lease, self.initial]
+                if await self._acquire_script(keys=keys, args=args):
+                    break
+                await asyncio.sleep(delay * random.uniform(0.5, 1.5))
+                delay = min(delay * 2, 1.0)
+        finally:
+            await get_redis().decr(self.waiting_key)
+
+        try:
+            yield
+        finally:
+            await get_redis().zrem(self.leases_key, lease)
+
+    async def increase(self) -> None:
+        await self._adjust(1, 1)
+
+    async def decrease(self) -> None:
+        limit = await self._adjust(self.backoff_factor, 0)
+        logger.info("Concurrency limit of %s lowered to %.1f", self.name, limit)
+
+    async def stats(self) -> LimiterStats:
+        redis = get_redis()
+        limit, in_flight, waiting = await asyncio.gather(
+            redis.get(self.limit_key), redis.zcard(self.leases_key), redis.get(self.waiting_key)
+        )
+        return LimiterStats(
+            limit=float(limit) if limit else float(self.initial),
+            in_flight=int(in_flight),
+            waiting=int(waiting or 0),
+        )
+
+    async def _adjust(self, factor: float, increment: float) -> float:
+        args = [factor, increment, self.initial, self.minimum, self.maximum]
+        return float(await self._adjust_script(keys=[self.limit_key], args=args))
+
+
+Limiter = LocalLimiter | RedisLimiter
+
+_limiters: dict[str, Limiter] = {}
+
+
+def _create_limiter(name: str, initial: int, minimum: int, maximum: int) -> Limiter:
+    if settings.STATE_BACKEND == "redis":
+        return RedisLimiter(
+            name,
+            initial,
+            minimum,
+            maximum,
+            backoff_factor=settings.REPLICATE_BACKOFF_FACTOR,
+            lease_timeout=settings.REPLICATE_LEASE_TIMEOUT,
+        )
+    return LocalLimiter(name, initial, minimum, maximum, backoff_factor=settings.REPLICATE_BACKOFF_FACTOR)
+
+
+def get_limiter(model_id: str) -> Limiter:
+    """Get the adaptive concurrency limiter of a model."""
+
+    name = f"replicate:{model_id}"
+    if name not in _limiters:
+        maximum = settings.REPLICATE_MODEL_CONCURRENCY.get(model_id, settings.REPLICATE_CONCURRENCY_MAX)
+        initial = min(settings.REPLICATE_CONCURRENCY_INITIAL, maximum)
+        _limiters[name] = _create_limiter(name, initial, settings.REPLICATE_CONCURRENCY_MIN, maximum)
+    return _limiters[name]
+
+
+def get_global_limiter() -> Limiter:
+    """Get the fixed concurrency limiter shared by all the models."""
+
+    name = "replicate"
+    if name not in _limiters:
+        limit = settings.REPLICATE_GLOBAL_CONCURRENCY
+        _limiters[name] = _create_limiter(name, limit, limit, limit)
+    return _limiters[name]
+
+
+async def get_limiter_stats() -> dict[str, LimiterStats]:
+    """Return the state of every limiter created by this process."""
+    return {name: await limiter.stats() for name, limiter in _limiters.items()}
+
+
+async def run_model(model_id: str, input: dict[str, Any]) -> Any:
+    """
+    Run a Replicate model within the global and per-model concurrency limits.
+    Throttled or slow calls shrink the model's limit; successful ones slowly grow it back.
+    """
+
+    limiter = get_limiter(model_id)
+
+    # The model slot is taken first so a throttled model does not hold global slots while waiting
+    async with limiter.slot(), get_global_limiter().slot():
+        start = time.monotonic()
+        try:
+            output = await replicate.async_run(model_id, input=input)
+        except ReplicateError as e:
+            REPLICATE_REQUESTS.labels(model_id, "run", "throttled" if e.status == 429 else "error").inc()
+            if e.status == 429:
+                await limiter.decrease()
+            raise
+        except Exception:
+            REPLICATE_REQUESTS.labels(model_id, "run", "error").inc()
+            raise
+
+        latency = time.monotonic() - start
+        REPLICATE_REQUEST_DURATION.labels(model_id, "run").observe(latency)
+        REPLICATE_REQUESTS.labels(model_id, "run", "success").inc()
+        if settings.REPLICATE_LATENCY_TARGET and latency > settings.REPLICATE_LATENCY_TARGET:
+            await limiter.decrease()
+        else:
+            await limiter.increase()
+        return output
+
+
+async def create_prediction(model_id: str, input: dict[str, Any], webhook: str) -> Prediction:
+    """
+    Start a Replicate prediction that calls `webhook` when it is done.
+    The concurrency limits only cover the creation call, the prediction itself runs unattended.
+    """
+
+    limiter = get_limiter(model_id)
+
+    async with limiter.slot(), get_global_limiter().slot():
+        try:
+            with REPLICATE_REQUEST_DURATION.labels(model_id, "create").time():
+                prediction = await replicate.models.predictions.async_create(
+                    model=model_id, input=input, webhook=webhook, webhook_events_filter=["completed"]
+                )
+        except ReplicateError as e:
+            REPLICATE_REQUESTS.labels(model_id, "create", "throttled" if e.status == 429 else "error").inc()
+            if e.status == 429:
+                await limiter.decrease()
+            raise
+        except Exception:
+            REPLICATE_REQUESTS.labels(model_id, "create", "error").inc()
+            raise
+
+        REPLICATE_REQUESTS.labels(model_id, "create", "success").inc()
+        await limiter.increase()
+        return prediction
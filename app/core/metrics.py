@@ -0,0 +1,143 @@
+"""
+Prometheus metrics of the web and worker processes.
+
+The web metrics are served on `/metrics`. With several uvicorn workers, set `PROMETHEUS_MULTIPROC_DIR`
+to a directory shared by all of them and emptied on start, so every process is aggregated.
+The worker metrics are written to the multiprocess directory of dramatiq's Prometheus middleware
+and served with its own metrics on port 9191 (`dramatiq_prom_port`).
+"""
+
+import os
+import time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Buckets in seconds, from fast cache hits up to slow image generations
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Duration of the HTTP requests by route.",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds",
+    "Duration of the database statements by kind.",
+    ["statement"],
+    buckets=LATENCY_BUCKETS,
+)
+STORAGE_OPERATION_DURATION = Histogram(
+    "storage_operation_duration_seconds",
+    "Duration of the object storage operations.",
+    ["operation"],
+    buckets=LATENCY_BUCKETS,
+)
+REPLICATE_REQUEST_DURATION = Histogram(
+    "replicate_request_duration_seconds",
+    "Duration of the Replicate calls by model.",
+    ["model", "operation"],
+    buckets=LATENCY_BUCKETS,
+)
+REPLICATE_REQUESTS = Counter(
+    "replicate_requests",
+    "Replicate calls by model and outcome.",
+    ["model", "operation", "outcome"],
+)
+GENERATION_STATUS_TRANSITIONS = Counter(
+    "generation_status_transitions",
+    "Generations entering each status.",
+    ["status"],
+)
+GENERATION_QUEUE_DEPTH = Gauge(
+    "generation_queue_depth",
+    "Generation jobs waiting in the broker queue.",
+    multiprocess_mode="mostrecent",
+)
+OBJECT_DELETIONS = Counter(
+    "object_deletions",
+    "Stored objects handled by the garbage collector: scheduled, deleted, failed or found orphaned.",
+    ["outcome"],
+)
+RESULT_CACHE_LOOKUPS = Counter(
+    "result_cache_lookups",
+    "Result cache lookups by outcome: hit or miss.",
+    ["outcome"],
+)
+CREDITS = Counter(
+    "credits",
+    "Credits moved by reason: reserved by generations, refunded or purchased.",
+    ["reason"],
+)
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """Time every statement run by the engine."""
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):  # type: ignore[no-untyped-def]
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):  # type: ignore[no-untyped-def]
+        duration = time.perf_counter() - conn.info["query_start_time"].pop()
+        kind = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+        DB_QUERY_DURATION.labels(kind).observe(duration)
+
+
+class MetricsMiddleware:
+    """
+    Record the duration of every HTTP request, labelled with the route template rather than the path.
+    Streaming responses are timed until their headers are sent, so long-lived event streams do not skew latencies.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        started = False
+
+        def observe(status: int) -> None:
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUEST_DURATION.labels(scope["method"], route, status).observe(time.perf_counter() - start)
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+                observe(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            if not started:
+                observe(500)
+            raise
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """Render the metrics of this process, or of all the processes in multiprocess mode."""
+
+    registry = REGISTRY
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)  # type: ignore[no-untyped-call]
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,27 @@
+import base64
+import binascii
+import uuid
+from datetime import datetime
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor cannot be decoded."""
+
+
+def encode_cursor(created_at: datetime, id: uuid.UUID) -> str:
+    """Encode the sort key of the last item of a page into an opaque cursor."""
+
+    raw = f"{created_at.isoformat()}|{id.hex}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    """Decode a cursor produced by `encode_cursor` back into its sort key."""
+
+    try:
+        padding = "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(cursor + padding).decode()
+        created_at, id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), uuid.UUID(hex=id)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise InvalidCursorError(f"Invalid cursor: {cursor}") from e
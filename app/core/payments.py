@@ -0,0 +1,100 @@
+import asyncio
+import hashlib
+import hmac
+import logging
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.core.credits import add_credits
+from app.db.config import SessionLocal
+from app.db.models import ProcessedEventORM, UserORM, utcnow
+
+settings = get_settings()
+
+logger = logging.getLogger(__name__)
+
+LEMONSQUEEZY = "lemonsqueezy"
+
+
+def verify_lemonsqueezy_signature(body: bytes, signature: str, secret: str) -> bool:
+    """Check the `X-Signature` header of a LemonSqueezy webhook, the hex HMAC-SHA256 of the raw body."""
+
+    expected = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+async def record_payment(session: AsyncSession, provider: str, identifier: str, user_email: str, units: int) -> bool:
+    """
+    Record a paid order so the workers credit it.
+    Returns False if the order was recorded already, such as when the provider retries a delivery.
+    """
+
+    try:
+        async with session.begin():
+            session.add(
+                ProcessedEventORM(provider=provider, identifier=identifier, user_email=user_email, units=units)
+            )
+    except IntegrityError:
+        return False
+    return True
+
+
+async def apply_payment_batch() -> int:
+    """
+    Credit up to `PAYMENT_BATCH_SIZE` recorded payments in a single transaction,
+    looking all their users up at once. Returns the number of payments handled.
+    """
+
+    async with SessionLocal() as session:
+        async with session.begin():
+            statement = (
+                select(ProcessedEventORM)
+                .where(ProcessedEventORM.processed_at.is_(None))
+                .order_by(ProcessedEventORM.created_at)
+                .limit(settings.PAYMENT_BATCH_SIZE)
+                .with_for_update(skip_locked=True)
+            )
+            events = (await session.scalars(statement)).all()
+            if not events:
+                return 0
+
+            emails = {event.user_email for event in events}
+            users = await session.execute(select(UserORM.email, UserORM.id).where(UserORM.email.in_(emails)))
+            user_ids = dict(users.tuples().all())
+
+            now = utcnow()
+            for event in events:
+                user_id = user_ids.get(event.user_email)
+                if user_id is None:
+                    logger.warning("No user found with email %s for order %s", event.user_email, event.identifier)
+                    event.error = f"No user found with email: {event.user_email}"
+                else:
+                    await add_credits(session, user_id, event.units, reference=event.identifier)
+                event.processed_at = now
+
+    return len(events)
+
+
+async def apply_payments() -> int:
+    """Credit the recorded payments batch by batch until none is left. Returns the number of payments handled."""
+
+    handled = 0
+    while count := await apply_payment_batch():
+        handled += count
+        if count < settings.PAYMENT_BATCH_SIZE:
+            break
+    return handled
+
+
+def main() -> None:
+    """Credit the payments left by lost jobs; run periodically from cron as `python -m app.core.payments`."""
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(apply_payments())
+
+
+if __name__ == "__main__":
+    main()
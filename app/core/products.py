@@ -33,6 +33,9 @@ def get_product_by_units(units: int) -> Product:
     return next(product for product in products if product["units"] == units)
 
 
-def get_product_by_name(name: str) -> Product:
-    """Retrieve a product by its name."""
-    return next(product for product in products if product["name"] == name)
+products_by_name = {product["name"]: product for product in products}
+
+
+def get_product_by_name(name: str) -> Product | None:
+    """Retrieve a product by its name, or None if there is no such product."""
+    return products_by_name.get(name)
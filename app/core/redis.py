@@ -0,0 +1,17 @@
+from functools import lru_cache
+
+from redis.asyncio import Redis
+
+from app.config import get_settings
+
+settings = get_settings()
+
+
+@lru_cache
+def get_redis() -> Redis:
+    """
+    Get the Redis client shared by the application.
+    The connection pool is created on first use.
+    """
+    client: Redis = Redis.from_url(settings.REDIS_URL)
+    return client
@@ -0,0 +1,128 @@
+import hashlib
+import json
+import logging
+import time
+import unicodedata
+import uuid
+from dataclasses import asdict, dataclass
+
+from redis.exceptions import RedisError
+
+from app.config import get_settings
+from app.core.cache import LRUCache
+from app.core.metrics import RESULT_CACHE_LOOKUPS
+from app.core.redis import get_redis
+
+settings = get_settings()
+
+logger = logging.getLogger(__name__)
+
+REDIS_KEY_PREFIX = "result-cache:"
+
+
+@dataclass(frozen=True)
+class CachedResult:
+    """A stored generation output that can be reused for an identical request."""
+
+    filename: str
+    size: int
+    checksum: str
+    content_type: str
+
+
+def result_cache_key(
+    model_id: str,
+    prompt: str,
+    ratio: str,
+    output_format: str,
+    seed: int | None,
+    user_id: uuid.UUID,
+) -> str:
+    """
+    Build the content address of a generation request.
+    Seeded requests are deterministic and shared by all users; unseeded ones only
+    match the same user's earlier requests.
+    """
+
+    normalized_prompt = " ".join(unicodedata.normalize("NFC", prompt).split())
+    scope = "global" if seed is not None else str(user_id)
+    payload = json.dumps([scope, model_id, normalized_prompt, ratio, output_format, seed])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResultCache:
+    """
+    Cache of generation outputs keyed by `result_cache_key`.
+
+    Entries expire `ttl` seconds after their last use. They are kept in a per-process
+    LRU, or in Redis when `use_redis` is set so all the workers share them.
+    """
+
+    def __init__(self, ttl: int, maxsize: int, use_redis: bool = False) -> None:
+        self.ttl = ttl
+        self.use_redis = use_redis
+        self.hits = 0
+        self.misses = 0
+        self._local: LRUCache[str, CachedResult] = LRUCache(maxsize)
+
+    @property
+    def hit_rate(self) -> float:
+        """The share of lookups served from the cache by this process; `result_cache_lookups` counts all of them."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    async def get(self, key: str) -> CachedResult | None:
+        """Return the cached output for `key` and extend its lifetime."""
+
+        result = self._get_local(key) if not self.use_redis else await self._get_redis(key)
+        if result is None:
+            self.misses += 1
+            RESULT_CACHE_LOOKUPS.labels("miss").inc()
+        else:
+            self.hits += 1
+            RESULT_CACHE_LOOKUPS.labels("hit").inc()
+        logger.debug("Result cache %s for %s (hit rate %.2f)", "hit" if result else "miss", key, self.hit_rate)
+        return result
+
+    async def set(self, key: str, result: CachedResult) -> None:
+        """Store the output of a generation for later identical requests."""
+
+        if not self.use_redis:
+            self._local.set(key, result, time.time() + self.ttl)
+            return
+
+        try:
+            await get_redis().set(REDIS_KEY_PREFIX + key, json.dumps(asdict(result)), ex=self.ttl)
+        except RedisError:
+            logger.warning("Failed to write to the result cache", exc_info=True)
+
+    async def delete(self, key: str) -> None:
+        """Forget an entry whose object no longer exists."""
+
+        self._local.delete(key)
+        if self.use_redis:
+            try:
+                await get_redis().delete(REDIS_KEY_PREFIX + key)
+            except RedisError:
+                logger.warning("Failed to delete from the result cache", exc_info=True)
+
+    def _get_local(self, key: str) -> CachedResult | None:
+        result = self._local.get(key)
+        if result is not None:
+            self._local.set(key, result, time.time() + self.ttl)
+        return result
+
+    async def _get_redis(self, key: str) -> CachedResult | None:
+        try:
+            value = await get_redis().getex(REDIS_KEY_PREFIX + key, ex=self.ttl)
+        except RedisError:
+            logger.warning("Failed to read from the result cache", exc_info=True)
+            return None
+        return CachedResult(**json.loads(value)) if value else None
+
+
+result_cache = ResultCache(
+    ttl=settings.RESULT_CACHE_TTL,
+    maxsize=settings.RESULT_CACHE_SIZE,
+    use_redis=settings.STATE_BACKEND == "redis",
+)
@@ -0,0 +1,74 @@
+import base64
+import hashlib
+import hmac
+import json
+import time
+import uuid
+from dataclasses import dataclass
+
+from app.config import get_settings
+
+settings = get_settings()
+
+
+class InvalidTokenError(Exception):
+    """Custom exception for session tokens that are malformed, tampered with or expired."""
+
+
+@dataclass(frozen=True)
+class SessionClaims:
+    """Claims carried by a session token."""
+
+    user_id: uuid.UUID
+    email: str
+    expires_at: int
+
+    @property
+    def expires_in(self) -> int:
+        """The number of seconds the token is still valid for."""
+        return self.expires_at - int(time.time())
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _sign(payload: str) -> str:
+    digest = hmac.new(settings.SECRET_KEY.encode(), payload.encode(), hashlib.sha256).digest()
+    return _b64encode(digest)
+
+
+def create_session_token(user_id: uuid.UUID, email: str, expires_in: int | None = None) -> str:
+    """Create a signed session token for the given user."""
+
+    expires_at = int(time.time()) + (expires_in or settings.SESSION_TOKEN_EXPIRES_IN)
+    claims = {"sub": str(user_id), "email": email, "exp": expires_at}
+    payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode())
+    return f"{payload}.{_sign(payload)}"
+
+
+def decode_session_token(token: str) -> SessionClaims:
+    """Verify a session token and return its claims."""
+
+    payload, _, signature = token.partition(".")
+    if not signature or not hmac.compare_digest(signature, _sign(payload)):
+        raise InvalidTokenError("Invalid session token signature")
+
+    try:
+        claims = json.loads(_b64decode(payload))
+        session_claims = SessionClaims(
+            user_id=uuid.UUID(claims["sub"]),
+            email=claims["email"],
+            expires_at=int(claims["exp"]),
+        )
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidTokenError("Malformed session token") from e
+
+    if session_claims.expires_in <= 0:
+        raise InvalidTokenError("Session token expired")
+
+    return session_claims
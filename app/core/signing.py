@@ -0,0 +1,146 @@
+import logging
+import time
+from collections.abc import Iterable
+from dataclasses import dataclass
+from datetime import timedelta
+
+import obstore as obs
+from redis.exceptions import RedisError
+
+from app.config import get_settings
+from app.core.cache import LRUCache
+from app.core.metrics import STORAGE_OPERATION_DURATION
+from app.core.redis import get_redis
+from app.core.storage import get_s3_store
+
+settings = get_settings()
+
+logger = logging.getLogger(__name__)
+
+REDIS_KEY_PREFIX = "signed-url:"
+
+
+@dataclass(frozen=True)
+class SignedURL:
+    """A presigned GET URL and the time at which it stops being valid."""
+
+    url: str
+    expires_at: float
+
+    @property
+    def expires_in(self) -> int:
+        """The number of seconds the URL is still valid for."""
+        return max(int(self.expires_at - time.time()), 0)
+
+
+class SignedURLCache:
+    """
+    Cache of presigned URLs keyed by object path.
+
+    URLs are kept in a per-process LRU and, when `redis` is set, in Redis so other
+    workers hand back the same URL. A cached URL is only reused while it is still
+    valid for more than `safety_margin` seconds.
+    """
+
+    def __init__(self, maxsize: int, expires_in: int, safety_margin: int, use_redis: bool = False) -> None:
+        if safety_margin >= expires_in:
+            raise ValueError("The safety margin must be shorter than the URL lifetime")
+
+        self.expires_in = expires_in
+        self.safety_margin = safety_margin
+        self.use_redis = use_redis
+        self._local: LRUCache[str, SignedURL] = LRUCache(maxsize)
+
+    def epoch(self) -> int:
+        """
+        Return a number that changes before the URLs handed out so far can expire.
+        Handed out URLs are valid for more than `safety_margin` seconds, so it changes that often.
+        """
+        return int(time.time() // self.safety_margin)
+
+    async def sign(self, path: str) -> SignedURL:
+        """Return a presigned GET URL for a single object."""
+        return (await self.sign_many([path]))[path]
+
+    async def sign_many(self, paths: Iterable[str]) -> dict[str, SignedURL]:
+        """Return presigned GET URLs for several objects, signing only those not cached."""
+
+        signed: dict[str, SignedURL] = {}
+        missing: list[str] = []
+        for path in dict.fromkeys(paths):
+            cached = self._local.get(path, min_ttl=self.safety_margin)
+            if cached is not None:
+                signed[path] = cached
+            else:
+                missing.append(path)
+
+        if missing and self.use_redis:
+            for path, cached_url in (await self._redis_get(missing)).items():
+                signed[path] = cached_url
+                self._local.set(path, cached_url, cached_url.expires_at)
+            missing = [path for path in missing if path not in signed]
+
+        if missing:
+            expires_at = time.time() + self.expires_in
+            with STORAGE_OPERATION_DURATION.labels("sign").time():
+                urls = await obs.sign_async(
+                    get_s3_store(), "GET", missing, expires_in=timedelta(seconds=self.expires_in)
+                )
+            fresh = {path: SignedURL(url=url, expires_at=expires_at) for path, url in zip(missing, urls, strict=True)}
+            for path, signed_url in fresh.items():
+                self._local.set(path, signed_url, expires_at)
+            if self.use_redis:
+                await self._redis_set(fresh)
+            signed.update(fresh)
+
+        return signed
+
+    async def invalidate(self, paths: Iterable[str]) -> None:
+        """Forget the URLs of objects that were deleted."""
+
+        keys = []
+        for path in paths:
+            self._local.delete(path)
+            keys.append(REDIS_KEY_PREFIX + path)
+
+        if keys and self.use_redis:
+            try:
+                await get_redis().delete(*keys)
+            except RedisError:
+                logger.warning("Failed to invalidate signed URLs in Redis", exc_info=True)
+
+    async def _redis_get(self, paths: list[str]) -> dict[str, SignedURL]:
+        try:
+            values = await get_redis().mget([REDIS_KEY_PREFIX + path for path in paths])
+        except RedisError:
+            logger.warning("Failed to read signed URLs from Redis", exc_info=True)
+            return {}
+
+        now = time.time()
+        signed = {}
+        for path, value in zip(paths, values, strict=True):
+            if value is None:
+                continue
+            expires_at, url = value.decode().split("|", 1)
+            if float(expires_at) - now > self.safety_margin:
+                signed[path] = SignedURL(url=url, expires_at=float(expires_at))
+        return signed
+
+    async def _redis_set(self, signed: dict[str, SignedURL]) -> None:
+        # Entries expire from Redis as soon as they are no longer reusable
+        ttl = self.expires_in - self.safety_margin
+        try:
+            async with get_redis().pipeline(transaction=False) as pipe:
+                for path, signed_url in signed.items():
+                    pipe.set(REDIS_KEY_PREFIX + path, f"{signed_url.expires_at}|{signed_url.url}", ex=ttl)
+                await pipe.execute()
+        except RedisError:
+            logger.warning("Failed to write signed URLs to Redis", exc_info=True)
+
+
+signed_urls = SignedURLCache(
+    maxsize=settings.SIGNED_URL_CACHE_SIZE,
+    expires_in=settings.SIGNED_URL_EXPIRES_IN,
+    safety_margin=settings.SIGNED_URL_SAFETY_MARGIN,
+    use_redis=settings.STATE_BACKEND == "redis",
+)
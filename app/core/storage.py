@@ -1,15 +1,96 @@
-from obstore.store import S3Store
+import hashlib
+from collections.abc import AsyncIterable, AsyncIterator, Sequence
+from dataclasses import dataclass
+from functools import lru_cache
+
+import obstore as obs
+from obstore.store import MemoryStore, ObjectStore, S3Store
 
 from app.config import get_settings
+from app.core.metrics import STORAGE_OPERATION_DURATION
 
 settings = get_settings()
 
-store = S3Store(
-    config={
-        "bucket": settings.S3_BUCKET_NAME,
-        "endpoint": settings.S3_BUCKET_ENDPOINT,
-        "access_key_id": settings.SCW_ACCESS_KEY,
-        "secret_access_key": settings.SCW_SECRET_KEY,
-    },
-    skip_signature=False,
-)
+
+@lru_cache
+def get_s3_store() -> S3Store:
+    """Get the client of the S3 bucket, created on first use. It signs the URLs of every storage backend."""
+    return S3Store(
+        config={
+            "bucket": settings.S3_BUCKET_NAME,
+            "endpoint": settings.S3_BUCKET_ENDPOINT,
+            "access_key_id": settings.SCW_ACCESS_KEY,
+            "secret_access_key": settings.SCW_SECRET_KEY,
+        },
+        skip_signature=False,
+    )
+
+
+@lru_cache
+def get_store() -> ObjectStore:
+    """Get the store of the outputs and their derivatives, created on first use."""
+
+    if settings.STORAGE_BACKEND == "memory":
+        return MemoryStore()
+    return get_s3_store()
+
+
+@dataclass(frozen=True)
+class UploadResult:
+    """Size and SHA-256 checksum of an uploaded object."""
+
+    size: int
+    checksum: str
+
+
+class _HashingStream:
+    """Pass chunks through while computing their total size and checksum."""
+
+    def __init__(self, chunks: AsyncIterable[bytes]) -> None:
+        self.chunks = chunks
+        self.size = 0
+        self.hash = hashlib.sha256()
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self.chunks:
+            self.size += len(chunk)
+            self.hash.update(chunk)
+            yield chunk
+
+
+async def stream_upload(path: str, chunks: AsyncIterable[bytes], content_type: str | None = None) -> UploadResult:
+    """
+    Upload a stream of chunks to the store with a multipart upload.
+    At most `UPLOAD_CHUNK_SIZE * UPLOAD_MAX_CONCURRENCY` bytes are buffered, whatever the object size.
+    """
+
+    stream = _HashingStream(chunks)
+    with STORAGE_OPERATION_DURATION.labels("put").time():
+        await obs.put_async(
+            get_store(),
+            path,
+            aiter(stream),
+            attributes={"Content-Type": content_type} if content_type else None,
+            chunk_size=settings.UPLOAD_CHUNK_SIZE,
+            max_concurrency=settings.UPLOAD_MAX_CONCURRENCY,
+        )
+    return UploadResult(size=stream.size, checksum=stream.hash.hexdigest())
+
+
+async def delete_objects(paths: Sequence[str]) -> None:
+    """Delete objects from the store, `STORAGE_DELETE_BATCH_SIZE` keys per call."""
+
+    batch_size = settings.STORAGE_DELETE_BATCH_SIZE
+    for start in range(0, len(paths), batch_size):
+        with STORAGE_OPERATION_DURATION.labels("delete").time():
+            await obs.delete_async(get_store(), paths[start : start + batch_size])
+
+
+async def upload_bytes(path: str, data: bytes, content_type: str | None = None) -> UploadResult:
+    """Upload an object held in memory to the store."""
+
+    with STORAGE_OPERATION_DURATION.labels("put").time():
+        await obs.put_async(
+            get_store(), path, data, attributes={"Content-Type": content_type} if content_type else None
+        )
+    return UploadResult(size=len(data), checksum=hashlib.sha256(data).hexdigest())
@@ -0,0 +1,94 @@
+import asyncio
+import logging
+import time
+import uuid
+
+from redis.exceptions import RedisError
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.core.cache import LRUCache
+from app.core.events import event_broker
+from app.db.models import UserORM
+
+settings = get_settings()
+
+logger = logging.getLogger(__name__)
+
+# Detached user snapshots, shared by the requests served by this process
+user_cache: LRUCache[uuid.UUID, UserORM] = LRUCache(maxsize=settings.USER_CACHE_SIZE)
+
+# The channel on which every process is told which users changed
+USER_INVALIDATIONS_CHANNEL = "users:invalidated"
+
+# Publications started after a commit, kept referenced until they finish
+_pending_publications: set[asyncio.Task[None]] = set()
+
+
+def get_cached_user(user_id: uuid.UUID) -> UserORM | None:
+    """Return the cached snapshot of a user, if any."""
+    return user_cache.get(user_id)
+
+
+def cache_user(user_orm: UserORM) -> None:
+    """Cache a detached snapshot of a user for `USER_CACHE_TTL` seconds."""
+    user_cache.set(user_orm.id, user_orm, time.time() + settings.USER_CACHE_TTL)
+
+
+def invalidate_user(user_id: uuid.UUID) -> None:
+    """Drop the cached snapshot of a user in this process."""
+    user_cache.delete(user_id)
+
+
+async def broadcast_user_invalidation(user_id: uuid.UUID) -> None:
+    """
+    Drop the cached snapshots of a user in every process, e.g. after their credits changed.
+    With the `memory` state backend, only this process is reached. A broker failure is logged, not raised;
+    the snapshots then expire after `USER_CACHE_TTL` seconds.
+    """
+
+    invalidate_user(user_id)
+    try:
+        await event_broker.publish(USER_INVALIDATIONS_CHANNEL, str(user_id))
+    except RedisError:
+        logger.warning("Failed to publish the invalidation of user %s", user_id, exc_info=True)
+
+
+def invalidate_user_on_commit(session: AsyncSession, user_id: uuid.UUID) -> None:
+    """
+    Drop the cached snapshots of a user in every process once the transaction of `session` is committed,
+    so no process can cache the previous state in between.
+    """
+
+    invalidated: set[uuid.UUID] = session.info.setdefault("invalidated_users", set())
+    if not invalidated:
+        event.listen(session.sync_session, "after_commit", _broadcast_invalidations, once=True)
+    invalidated.add(user_id)
+
+
+def _broadcast_invalidations(session: Session) -> None:
+    # Commits of async sessions run in the thread of the event loop
+    loop = asyncio.get_running_loop()
+    for user_id in session.info.pop("invalidated_users", ()):
+        task = loop.create_task(broadcast_user_invalidation(user_id))
+        _pending_publications.add(task)
+        task.add_done_callback(_pending_publications.discard)
+
+
+async def listen_user_invalidations() -> None:
+    """Drop the snapshots of the users changed by other processes, for as long as the application runs."""
+
+    while True:
+        try:
+            async with event_broker.subscribe(USER_INVALIDATIONS_CHANNEL) as subscription:
+                while True:
+                    message = await subscription.get(timeout=settings.EVENTS_HEARTBEAT_INTERVAL)
+                    if message is not None:
+                        invalidate_user(uuid.UUID(message))
+        except RedisError:
+            logger.warning("Lost the subscription to the user invalidations", exc_info=True)
+            # Changes may be missed until the subscription is back
+            user_cache.clear()
+            await asyncio.sleep(1)
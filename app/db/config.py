@@ -1,27 +1,103 @@
 from __future__ import annotations
 
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+import uuid
+from collections.abc import Callable
+from functools import lru_cache
+from typing import Any, cast
+
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 
 from app.config import get_settings
+from app.core.metrics import instrument_engine
+from app.db.pool import InstrumentedPool, PoolStats
+from app.db.replica import ReplicaMonitor
 
 settings = get_settings()
 
 
-engine = create_async_engine(
-    str(settings.SQLALCHEMY_DATABASE_URI),
-    echo=False,
-    future=True,
-)
+def get_connect_args() -> dict[str, Any]:
+    """
+    Return the asyncpg connection arguments.
+    In pgbouncer mode the statement caches are disabled and statements get unique names,
+    since consecutive transactions may run on different server connections.
+    """
+
+    if settings.DB_PGBOUNCER:
+        return {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+        }
+    return {
+        "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+        "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+    }
+
+
+def create_engine(url: str) -> AsyncEngine:
+    """Create an instrumented engine with the pool settings."""
+
+    engine = create_async_engine(
+        url,
+        echo=False,
+        future=True,
+        poolclass=InstrumentedPool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        connect_args=get_connect_args(),
+    )
+    instrument_engine(engine)
+    return engine
+
+
+class LazySessionMaker(async_sessionmaker[AsyncSession]):
+    """Session factory that creates its engine with the first session, so importing the app connects nothing."""
+
+    def __init__(self, get_bind: Callable[[], AsyncEngine]) -> None:
+        super().__init__(class_=AsyncSession, expire_on_commit=False)
+        self._get_bind = get_bind
+
+    def __call__(self, **local_kw: Any) -> AsyncSession:
+        if self.kw.get("bind") is None:
+            self.configure(bind=self._get_bind())
+        return super().__call__(**local_kw)
+
+
+@lru_cache
+def get_engine() -> AsyncEngine:
+    """Get the engine of the primary database, created on first use."""
+    return create_engine(str(settings.SQLALCHEMY_DATABASE_URI))
+
+
+@lru_cache
+def get_replica_engine() -> AsyncEngine:
+    """Get the engine of the read replica, created on first use. Requires a configured replica."""
+    return create_engine(str(settings.SQLALCHEMY_REPLICA_DATABASE_URI))
+
+
+@lru_cache
+def get_replica_monitor() -> ReplicaMonitor | None:
+    """Get the lag monitor of the read replica, or None if no replica is configured."""
+
+    if not settings.SQLALCHEMY_REPLICA_DATABASE_URI:
+        return None
+    return ReplicaMonitor(
+        get_replica_engine(),
+        max_lag=settings.REPLICA_MAX_LAG,
+        check_interval=settings.REPLICA_LAG_CHECK_INTERVAL,
+    )
+
+
+SessionLocal = LazySessionMaker(get_engine)
 
-SessionLocal = async_sessionmaker(
-    bind=engine,
-    class_=AsyncSession,
-    expire_on_commit=False,
-)
+# Sessions of the read replica, if one is configured
+ReplicaSessionLocal = LazySessionMaker(get_replica_engine) if settings.SQLALCHEMY_REPLICA_DATABASE_URI else None
 
 
-async def init_db() -> None:
-    from app.db.models import Base
+def get_pool_stats() -> PoolStats:
+    """Return the state of the connection pool of this process."""
 
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    return cast(InstrumentedPool, get_engine().pool).stats()
@@ -2,7 +2,7 @@ import uuid
 from datetime import UTC, datetime
 from enum import StrEnum
 
-from sqlalchemy import ForeignKey
+from sqlalchemy import ForeignKey, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 from sqlalchemy.types import DateTime, Enum, Integer, String
@@ -32,6 +32,14 @@ class Status(StrEnum):
     FAILED = "FAILED"
 
 
+class CreditReason(StrEnum):
+    """Enumeration for the reasons of a credit balance change."""
+
+    GENERATION = "GENERATION"
+    REFUND = "REFUND"
+    PURCHASE = "PURCHASE"
+
+
 class ContentType(StrEnum):
     """Enumeration for content types of generated images."""
 
@@ -39,6 +47,11 @@ class ContentType(StrEnum):
     JPG = "image/jpeg"
 
 
+def utcnow() -> datetime:
+    """Return the current time in UTC, used as a column default."""
+    return datetime.now(UTC)
+
+
 class Base(DeclarativeBase):
     pass
 
@@ -57,8 +70,9 @@ class UserORM(Base):
     name: Mapped[str] = mapped_column(String(255), nullable=False)
     email: Mapped[str] = mapped_column(String(128), unique=True, nullable=False)
     picture: Mapped[str | None] = mapped_column(String(1024), nullable=True)
-    created_at: Mapped[datetime] = mapped_column(DateTime(True), nullable=False, default=datetime.now(UTC))
+    created_at: Mapped[datetime] = mapped_column(DateTime(True), nullable=False, default=utcnow)
     last_login: Mapped[datetime | None] = mapped_column(DateTime(True), nullable=True)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(True), nullable=False, default=utcnow, onupdate=utcnow)
     credits: Mapped[int] = mapped_column(Integer, nullable=False, default=100)
 
     # Relationships
@@ -79,14 +93,105 @@ class GenerationORM(Base):
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("users.id"), nullable=False)
     prompt: Mapped[str] = mapped_column(String(1024), nullable=False)
-    created_at: Mapped[datetime] = mapped_column(DateTime(True), nullable=False, default=datetime.now(UTC))
+    created_at: Mapped[datetime] = mapped_column(DateTime(True), nullable=False, default=utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(True), nullable=False, default=utcnow, onupdate=utcnow)
     output_format: Mapped[OutputFormat] = mapped_column(Enum(OutputFormat), nullable=False)
     ratio: Mapped[Ratio] = mapped_column(Enum(Ratio), nullable=False)
+    seed: Mapped[int | None] = mapped_column(Integer, nullable=True)
     status: Mapped[Status] = mapped_column(Enum(Status), nullable=False)
     error_message: Mapped[str | None] = mapped_column(String(1024), nullable=True)
     filename: Mapped[str | None] = mapped_column(String(1024), nullable=True)
     size: Mapped[int | None] = mapped_column(Integer, nullable=True)
     content_type: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    checksum: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    thumbnail_filename: Mapped[str | None] = mapped_column(String(1024), nullable=True)
+    preview_filename: Mapped[str | None] = mapped_column(String(1024), nullable=True)
+    prediction_id: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    cost: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
 
     # Relationships
     user: Mapped[UserORM] = relationship("UserORM", back_populates="generations")
+
+
+class CreditLedgerORM(Base):
+    """
+    Credit ledger model recording every change of a user's credit balance.
+    The `credits` column of the user is the running balance of these entries.
+    """
+
+    __tablename__ = "credit_ledger"
+
+    # Fields
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("users.id"), nullable=False)
+    generation_id: Mapped[uuid.UUID | None] = mapped_column(
+        ForeignKey("generations.id", ondelete="SET NULL"), nullable=True
+    )
+    amount: Mapped[int] = mapped_column(Integer, nullable=False)
+    balance: Mapped[int] = mapped_column(Integer, nullable=False)
+    reason: Mapped[CreditReason] = mapped_column(Enum(CreditReason), nullable=False)
+    reference: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(True), nullable=False, default=utcnow)
+
+    # Relationships
+    generation: Mapped[GenerationORM | None] = relationship("GenerationORM", passive_deletes=True)
+
+
+class ObjectDeletionORM(Base):
+    """
+    Outbox of the stored objects to delete, written in the transaction that drops their last reference.
+    Rows are removed by the sweeper once the objects are gone from the store.
+    """
+
+    __tablename__ = "object_deletions"
+
+    # Fields
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    path: Mapped[str] = mapped_column(String(1024), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(True), nullable=False, default=utcnow)
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime(True), nullable=False, default=utcnow)
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    last_error: Mapped[str | None] = mapped_column(String(1024), nullable=True)
+
+
+class ProcessedEventORM(Base):
+    """
+    Payment provider event, recorded once per order so replayed deliveries are ignored.
+    The workers apply its credits and set `processed_at`.
+    """
+
+    __tablename__ = "processed_events"
+
+    # Fields
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    provider: Mapped[str] = mapped_column(String(32), nullable=False)
+    identifier: Mapped[str] = mapped_column(String(255), nullable=False)
+    user_email: Mapped[str] = mapped_column(String(128), nullable=False)
+    units: Mapped[int] = mapped_column(Integer, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(True), nullable=False, default=utcnow)
+    processed_at: Mapped[datetime | None] = mapped_column(DateTime(True), nullable=True)
+    error: Mapped[str | None] = mapped_column(String(1024), nullable=True)
+
+
+# Serves the per-user history listing, ordered by most recent first.
+Index(
+    "ix_generations_user_id_created_at_id",
+    GenerationORM.user_id,
+    GenerationORM.created_at.desc(),
+    GenerationORM.id.desc(),
+)
+
+Index("ix_credit_ledger_user_id_created_at", CreditLedgerORM.user_id, CreditLedgerORM.created_at)
+
+# Serves the sweeper claiming the deletions that are due
+Index("ix_object_deletions_next_attempt_at", ObjectDeletionORM.next_attempt_at)
+
+# Makes every order of a provider recorded at most once
+Index("ix_processed_events_provider_identifier", ProcessedEventORM.provider, ProcessedEventORM.identifier, unique=True)
+
+# Serves the workers claiming the events whose credits are not applied yet
+Index(
+    "ix_processed_events_pending",
+    ProcessedEventORM.created_at,
+    postgresql_where=ProcessedEventORM.processed_at.is_(None),
+)
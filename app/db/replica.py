@@ -0,0 +1,59 @@
+import asyncio
+import logging
+import time
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.config import get_settings
+
+settings = get_settings()
+
+logger = logging.getLogger(__name__)
+
+# The replay delay of the replica, zero when it has replayed everything it received
+LAG_QUERY = text(
+    """
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+    """
+)
+
+
+class ReplicaMonitor:
+    """
+    Track the replication lag of a read replica, measured at most every `check_interval` seconds.
+    The replica is considered unusable while it lags more than `max_lag` seconds or cannot be reached.
+    """
+
+    def __init__(self, engine: AsyncEngine, max_lag: float, check_interval: float) -> None:
+        self.engine = engine
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.lag: float | None = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def is_usable(self) -> bool:
+        """Check whether reads can be sent to the replica."""
+
+        if time.monotonic() - self._checked_at > self.check_interval and not self._lock.locked():
+            # Only one request measures the lag; the others use the last measure meanwhile
+            async with self._lock:
+                await self._check()
+        return self.lag is not None and self.lag <= self.max_lag
+
+    async def _check(self) -> None:
+        try:
+            async with self.engine.connect() as connection:
+                self.lag = float((await connection.execute(LAG_QUERY)).scalar_one())
+        except Exception:
+            logger.warning("Failed to measure the replication lag", exc_info=True)
+            self.lag = None
+        finally:
+            self._checked_at = time.monotonic()
+
+        if self.lag is None or self.lag > self.max_lag:
+            logger.info("Reads fall back to the primary, replication lag is %s", self.lag)
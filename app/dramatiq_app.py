@@ -0,0 +1,154 @@
+import asyncio
+import uuid
+from collections.abc import Iterable
+from typing import cast
+
+import dramatiq
+import redis
+from dramatiq.asyncio import async_to_sync
+from dramatiq.broker import Broker
+from dramatiq.brokers.redis import RedisBroker
+from dramatiq.brokers.stub import StubBroker
+from dramatiq.middleware import AsyncIO, CurrentMessage
+
+from app.config import get_settings
+
+settings = get_settings()
+
+
+def create_broker() -> Broker:
+    """Create the broker used to dispatch jobs to the workers."""
+
+    broker: Broker
+    if settings.TASK_BROKER == "stub":
+        broker = StubBroker()  # type: ignore[no-untyped-call]
+    else:
+        broker = RedisBroker(url=settings.REDIS_URL)  # type: ignore[no-untyped-call]
+
+    broker.add_middleware(AsyncIO())  # type: ignore[no-untyped-call]
+    broker.add_middleware(CurrentMessage())  # type: ignore[no-untyped-call]
+    return broker
+
+
+broker = create_broker()
+dramatiq.set_broker(broker)
+
+
+def is_final_attempt() -> bool:
+    """Check whether the message being processed will not be retried if it fails."""
+
+    message = CurrentMessage.get_current_message()
+    if message is None:
+        return True
+    return int(message.options.get("retries", 0)) >= settings.GENERATION_MAX_RETRIES
+
+
+@dramatiq.actor(
+    max_retries=settings.GENERATION_MAX_RETRIES,
+    min_backoff=settings.GENERATION_MIN_BACKOFF_MS,
+    max_backoff=settings.GENERATION_MAX_BACKOFF_MS,
+    time_limit=settings.GENERATION_TIME_LIMIT_MS,
+)
+def generate_image(generation_id: str) -> None:
+    """Run the image generation for the given generation ID."""
+
+    from app.tasks import generate_image_task
+
+    # The message context is only visible from the worker thread, so it is read
+    # before handing the coroutine over to the event loop thread.
+    final_attempt = is_final_attempt()
+    async_to_sync(generate_image_task)(uuid.UUID(generation_id), final_attempt=final_attempt)
+
+
+@dramatiq.actor(
+    max_retries=settings.GENERATION_MAX_RETRIES,
+    min_backoff=settings.GENERATION_MIN_BACKOFF_MS,
+    max_backoff=settings.GENERATION_MAX_BACKOFF_MS,
+    time_limit=settings.GENERATION_TIME_LIMIT_MS,
+)
+def complete_prediction(generation_id: str, prediction_id: str, output_url: str | None, error: str | None) -> None:
+    """Store the output of a prediction reported by the Replicate webhook."""
+
+    from app.tasks import complete_prediction_task
+
+    final_attempt = is_final_attempt()
+    async_to_sync(complete_prediction_task)(
+        uuid.UUID(generation_id), prediction_id, output_url, error, final_attempt=final_attempt
+    )
+
+
+@dramatiq.actor(queue_name="maintenance", max_retries=0)
+def sweep_objects() -> None:
+    """Delete the stored objects scheduled in the outbox."""
+
+    from app.object_gc import sweep_object_deletions
+
+    async_to_sync(sweep_object_deletions)()
+
+
+@dramatiq.actor(queue_name="maintenance", max_retries=0, time_limit=3_600_000)
+def reconcile_stored_objects() -> None:
+    """Find the stored objects no generation references and delete them."""
+
+    from app.object_gc import reconcile_objects, sweep_object_deletions
+
+    async_to_sync(reconcile_objects)()
+    async_to_sync(sweep_object_deletions)()
+
+
+@dramatiq.actor(queue_name="maintenance", max_retries=0)
+def recover_stale_predictions() -> None:
+    """Settle the generations whose Replicate webhook is overdue."""
+
+    from app.stale_predictions import recover_stale_predictions
+
+    async_to_sync(recover_stale_predictions)()
+
+
+@dramatiq.actor(queue_name="payments", max_retries=settings.PAYMENT_MAX_RETRIES)
+def apply_payments() -> None:
+    """Credit the accounts of the recorded payments."""
+
+    from app.core.payments import apply_payments
+
+    async_to_sync(apply_payments)()
+
+
+async def get_queue_depth() -> int:
+    """Return the number of generation jobs waiting in the broker queue."""
+
+    if isinstance(broker, StubBroker):
+        return int(broker.queues[generate_image.queue_name].qsize())
+    if isinstance(broker, RedisBroker):
+        client: redis.Redis = broker.client
+        key = f"{broker.namespace}:{generate_image.queue_name}"
+        # The sync client returns the length itself, not an awaitable
+        return await asyncio.to_thread(lambda: cast(int, client.llen(key)))
+    return 0
+
+
+async def enqueue_generations(generation_ids: Iterable[uuid.UUID]) -> None:
+    """
+    Hand generation jobs over to the workers.
+    Broker calls are blocking, so they run in threads, at most `GENERATION_DISPATCH_CONCURRENCY` at a time.
+    """
+
+    semaphore = asyncio.Semaphore(settings.GENERATION_DISPATCH_CONCURRENCY)
+
+    async def enqueue(generation_id: uuid.UUID) -> None:
+        async with semaphore:
+            await asyncio.to_thread(generate_image.send, str(generation_id))
+
+    await asyncio.gather(*(enqueue(generation_id) for generation_id in generation_ids))
+
+
+async def enqueue_object_sweep() -> None:
+    """Ask the workers to delete the objects scheduled in the outbox."""
+
+    await asyncio.to_thread(sweep_objects.send)
+
+
+async def enqueue_payments() -> None:
+    """Ask the workers to credit the recorded payments."""
+
+    await asyncio.to_thread(apply_payments.send)
@@ -1,4 +1,6 @@
-from collections.abc import AsyncGenerator
+import asyncio
+import contextlib
+from collections.abc import AsyncIterator
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
@@ -7,7 +9,8 @@ from starlette.middleware.cors import CORSMiddleware
 
 from app.api.main import api_router
 from app.config import get_settings
-from app.db.config import init_db
+from app.core.metrics import MetricsMiddleware
+from app.core.users import listen_user_invalidations
 
 settings = get_settings()
 
@@ -18,9 +21,14 @@ def custom_generate_unique_id(route: APIRoute) -> str:
 
 
 @asynccontextmanager
-async def lifespan(app: FastAPI) -> AsyncGenerator[None]:
-    await init_db()
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Keep the user snapshots of this process in sync with the changes made by the others."""
+
+    listener = asyncio.create_task(listen_user_invalidations())
     yield
+    listener.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await listener
 
 
 def init_app() -> FastAPI:
@@ -41,6 +49,7 @@ def init_app() -> FastAPI:
             allow_headers=["*"],
         )
 
+    app.add_middleware(MetricsMiddleware)
     app.include_router(api_router)
     return app
 
@@ -0,0 +1,225 @@
+"""
+Garbage collection of the stored objects.
+
+Requests never wait on the store to delete objects: the transaction dropping the last reference to an object
+records it in the `object_deletions` outbox, and the sweeper later removes the objects in bulk, retrying failures.
+The reconciliation pass lists the `{user_id}/outputs/` and `{user_id}/thumbs/` prefixes to find the objects
+no generation references, such as the outputs of jobs that failed after their upload, and schedules them too.
+
+Both run as worker jobs. The sweep is triggered by every deletion; to also retry failed deletions
+and reconcile periodically, run from cron:
+
+    python -m app.object_gc sweep
+    python -m app.object_gc reconcile
+"""
+
+import argparse
+import asyncio
+import logging
+import uuid
+from collections.abc import Iterable, Sequence
+from datetime import timedelta
+
+import obstore as obs
+from sqlalchemy import Row, delete, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.core.metrics import OBJECT_DELETIONS
+from app.core.storage import delete_objects, get_store
+from app.db.config import SessionLocal
+from app.db.models import GenerationORM, ObjectDeletionORM, UserORM, utcnow
+
+settings = get_settings()
+
+logger = logging.getLogger(__name__)
+
+# The folders of a user's prefix holding objects referenced by the generations
+GENERATION_FOLDERS = ("outputs", "thumbs")
+
+# The ID, path and number of attempts of a claimed deletion
+ClaimedDeletion = Row[uuid.UUID, str, int]
+
+
+async def schedule_object_deletions(session: AsyncSession, paths: Iterable[str]) -> int:
+    """Record objects to delete in the outbox, as part of the caller's transaction."""
+
+    rows = [{"path": path} for path in paths]
+    if rows:
+        await session.execute(insert(ObjectDeletionORM), rows)
+        OBJECT_DELETIONS.labels("scheduled").inc(len(rows))
+    return len(rows)
+
+
+def get_retry_delay(attempts: int) -> timedelta:
+    """Get the exponential backoff before retrying a deletion that failed `attempts` times."""
+
+    delay = settings.OBJECT_GC_MIN_BACKOFF * 2 ** max(attempts - 1, 0)
+    return timedelta(seconds=min(delay, settings.OBJECT_GC_MAX_BACKOFF))
+
+
+async def claim_deletions(limit: int) -> Sequence[ClaimedDeletion]:
+    """
+    Claim up to `limit` deletions that are due.
+    They are leased for `OBJECT_GC_LEASE` seconds, so concurrent sweepers skip them and a crashed sweep is retried.
+    """
+
+    now = utcnow()
+    async with SessionLocal() as session:
+        async with session.begin():
+            statement = (
+                select(ObjectDeletionORM.id, ObjectDeletionORM.path, ObjectDeletionORM.attempts)
+                .where(ObjectDeletionORM.next_attempt_at <= now)
+                .order_by(ObjectDeletionORM.next_attempt_at)
+                .limit(limit)
+                .with_for_update(skip_locked=True)
+            )
+            rows = (await session.execute(statement)).all()
+            if rows:
+                await session.execute(
+                    update(ObjectDeletionORM)
+                    .where(ObjectDeletionORM.id.in_([row.id for row in rows]))
+                    .values(
+                        next_attempt_at=now + timedelta(seconds=settings.OBJECT_GC_LEASE),
+                        attempts=ObjectDeletionORM.attempts + 1,
+                    ),
+                    execution_options={"synchronize_session": False},
+                )
+    return rows
+
+
+async def delete_claimed(rows: Sequence[ClaimedDeletion]) -> int:
+    """
+    Delete the objects of claimed deletions with a single bulk call, then drop their rows.
+    On failure the deletions are rescheduled with a backoff. Returns the number of objects deleted.
+    """
+
+    ids: list[uuid.UUID] = [row.id for row in rows]
+    try:
+        await delete_objects([row.path for row in rows])
+    except Exception as err:
+        logger.warning("Failed to delete %d objects, retrying later", len(rows), exc_info=True)
+        now = utcnow()
+        async with SessionLocal() as session:
+            async with session.begin():
+                await session.execute(
+                    update(ObjectDeletionORM),
+                    [
+                        {
+                            "id": row.id,
+                            "next_attempt_at": now + get_retry_delay(row.attempts + 1),
+                            "last_error": str(err)[:1024],
+                        }
+                        for row in rows
+                    ],
+                )
+        OBJECT_DELETIONS.labels("failed").inc(len(rows))
+        return 0
+
+    async with SessionLocal() as session:
+        async with session.begin():
+            await session.execute(
+                delete(ObjectDeletionORM).where(ObjectDeletionORM.id.in_(ids)),
+                execution_options={"synchronize_session": False},
+            )
+    OBJECT_DELETIONS.labels("deleted").inc(len(rows))
+    return len(rows)
+
+
+async def sweep_object_deletions() -> int:
+    """
+    Drain the due deletions of the outbox, `OBJECT_GC_BATCH_SIZE` at a time.
+    Each batch is split into bulk delete calls, at most `OBJECT_GC_CONCURRENCY` of them in flight.
+    Returns the number of objects deleted.
+    """
+
+    semaphore = asyncio.Semaphore(settings.OBJECT_GC_CONCURRENCY)
+    call_size = settings.STORAGE_DELETE_BATCH_SIZE
+
+    async def delete_chunk(rows: Sequence[ClaimedDeletion]) -> int:
+        async with semaphore:
+            return await delete_claimed(rows)
+
+    deleted = 0
+    while True:
+        rows = await claim_deletions(settings.OBJECT_GC_BATCH_SIZE)
+        counts = await asyncio.gather(
+            *(delete_chunk(rows[start : start + call_size]) for start in range(0, len(rows), call_size))
+        )
+        deleted += sum(counts)
+        # Failed deletions are pushed back by their backoff, so a short batch means nothing is due anymore
+        if len(rows) < settings.OBJECT_GC_BATCH_SIZE:
+            return deleted
+
+
+async def find_orphans(user_id: uuid.UUID) -> list[str]:
+    """
+    List the objects of a user that no generation references and that are not scheduled for deletion yet.
+    Objects younger than `OBJECT_GC_GRACE_PERIOD` are skipped, as the job storing them may still be running.
+    """
+
+    async with SessionLocal() as session:
+        referenced = await session.execute(
+            select(GenerationORM.filename, GenerationORM.thumbnail_filename, GenerationORM.preview_filename).where(
+                GenerationORM.user_id == user_id
+            )
+        )
+        scheduled = await session.scalars(
+            select(ObjectDeletionORM.path).where(ObjectDeletionORM.path.startswith(f"{user_id}/"))
+        )
+        known = {path for row in referenced for path in row if path} | set(scheduled)
+
+    cutoff = utcnow() - timedelta(seconds=settings.OBJECT_GC_GRACE_PERIOD)
+    orphans: list[str] = []
+    for folder in GENERATION_FOLDERS:
+        stream = obs.list(get_store(), prefix=f"{user_id}/{folder}/", chunk_size=settings.STORAGE_DELETE_BATCH_SIZE)
+        async for chunk in stream:
+            orphans.extend(
+                meta["path"] for meta in chunk if meta["path"] not in known and meta["last_modified"] < cutoff
+            )
+    return orphans
+
+
+async def reconcile_objects() -> int:
+    """Schedule the deletion of the orphaned objects of every user. Returns the number of objects found."""
+
+    async with SessionLocal() as session:
+        user_ids = (await session.scalars(select(UserORM.id))).all()
+
+    found = 0
+    for user_id in user_ids:
+        orphans = await find_orphans(user_id)
+        if not orphans:
+            continue
+        async with SessionLocal() as session:
+            async with session.begin():
+                await schedule_object_deletions(session, orphans)
+        OBJECT_DELETIONS.labels("orphaned").inc(len(orphans))
+        logger.info("Found %d orphaned objects of user %s", len(orphans), user_id)
+        found += len(orphans)
+    return found
+
+
+async def run(command: str) -> None:
+    if command == "reconcile":
+        found = await reconcile_objects()
+        logger.info("Scheduled the deletion of %d orphaned objects", found)
+    deleted = await sweep_object_deletions()
+    logger.info("Deleted %d objects", deleted)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Delete the stored objects no generation references anymore.")
+    parser.add_argument(
+        "command",
+        choices=["sweep", "reconcile"],
+        help="`sweep` drains the pending deletions, `reconcile` first looks for orphaned objects",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run(args.command))
+
+
+if __name__ == "__main__":
+    main()
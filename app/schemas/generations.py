@@ -1,10 +1,13 @@
 from datetime import datetime
 
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 from pydantic.types import UUID4
 
+from app.config import get_settings
 from app.db.models import ContentType, OutputFormat, Ratio, Status
 
+settings = get_settings()
+
 
 class GenerationData(BaseModel):
     """Schema for a generation request."""
@@ -20,23 +23,42 @@ class GenerationData(BaseModel):
     size: int | None = None
     content_type: ContentType | None = None
     ratio: Ratio
+    seed: int | None = None
     filename: str | None = None
     preview_url: str | None = None
+    thumbnail_url: str | None = None
 
 
 class GenerationList(BaseModel):
     """Schema for a list of generations."""
 
-    count: int
+    count: int | None = None
     data: list[GenerationData]
+    next_cursor: str | None = None
 
 
 class GenerationStatus(BaseModel):
     """Schema for the status of a generation request."""
 
+    model_config = ConfigDict(from_attributes=True)
+
     id: UUID4
     status: Status
     error_message: str | None = None
+    updated_at: datetime | None = None
+
+
+class GenerationStatusList(BaseModel):
+    """Schema for the statuses of several generation requests."""
+
+    data: list[GenerationStatus]
+
+
+class GenerationStatusQuery(BaseModel):
+    """Schema for a request of the statuses of several generations."""
+
+    ids: list[UUID4] = Field(min_length=1, max_length=settings.STATUS_BATCH_MAX_IDS)
+    updated_since: datetime | None = None
 
 
 class GenerationCreateResponse(BaseModel):
@@ -46,6 +68,35 @@ class GenerationCreateResponse(BaseModel):
     generation_id: UUID4
 
 
+class GenerationRequest(BaseModel):
+    """Schema for a single generation request of a batch."""
+
+    prompt: str = Field(min_length=1, max_length=1024)
+    output_format: OutputFormat = OutputFormat.PNG
+    ratio: Ratio = Ratio.RATIO_1_1
+    seed: int | None = None
+
+
+class GenerationBatchCreate(BaseModel):
+    """Schema for a batch of generation requests."""
+
+    items: list[GenerationRequest] = Field(min_length=1, max_length=settings.GENERATION_BATCH_MAX_ITEMS)
+
+
+class GenerationBatchCreateResponse(BaseModel):
+    """Schema for the response of a batch generation creation request."""
+
+    message: str
+    generation_ids: list[UUID4]
+
+
+class GenerationBulkDeleteResponse(BaseModel):
+    """Schema for the response of a bulk deletion of generations."""
+
+    message: str
+    generation_ids: list[UUID4]
+
+
 class DownloadURLResponse(BaseModel):
     """Schema for the response containing a download URL."""
 
@@ -108,3 +108,27 @@ class Meta(BaseModel):
 class OrderResponse(BaseModel):
     data: OrderData
     meta: Meta
+
+
+class CallbackOrderItem(BaseModel):
+    product_name: str
+
+
+class CallbackAttributes(BaseModel):
+    identifier: str
+    status: str
+    user_email: str | None = None
+    first_order_item: CallbackOrderItem
+
+
+class CallbackData(BaseModel):
+    attributes: CallbackAttributes
+
+
+class OrderCallback(BaseModel):
+    """
+    The fields of an order webhook used to credit the buyer.
+    Every other field of the payload described by `OrderResponse` is skipped rather than validated.
+    """
+
+    data: CallbackData
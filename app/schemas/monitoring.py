@@ -0,0 +1,16 @@
+from pydantic import BaseModel, ConfigDict
+
+
+class DBPoolStats(BaseModel):
+    """Schema for the state of the database connection pool of a process."""
+
+    model_config = ConfigDict(from_attributes=True)
+
+    size: int
+    checked_out: int
+    overflow: int
+    checkouts: int
+    timeouts: int
+    wait_time_total: float
+    wait_time_max: float
+    wait_time_avg: float
@@ -0,0 +1,19 @@
+from typing import Any, Literal
+
+from pydantic import BaseModel
+
+
+class PredictionWebhook(BaseModel):
+    """Schema for the prediction sent by a Replicate webhook."""
+
+    id: str
+    status: Literal["starting", "processing", "succeeded", "failed", "canceled"]
+    output: Any = None
+    error: str | None = None
+
+    @property
+    def output_url(self) -> str | None:
+        """The URL of the first output file, if the prediction produced one."""
+
+        output = self.output[0] if isinstance(self.output, list) and self.output else self.output
+        return output if isinstance(output, str) else None
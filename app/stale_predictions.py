@@ -0,0 +1,104 @@
+"""
+Recovery of the predictions whose webhook never arrived.
+
+With `REPLICATE_WEBHOOKS_ENABLED`, a generation waits in progress until Replicate calls the webhook.
+A lost delivery, or a callback rejected by the backend, would leave it there with its credits reserved.
+The generations still waiting `REPLICATE_WEBHOOK_DEADLINE` seconds after their prediction started are
+polled instead: finished predictions are completed as the webhook would have, and those still running after
+`REPLICATE_PREDICTION_TIMEOUT` seconds are canceled and their generation failed and refunded.
+
+It runs as a worker job; to run it periodically, call from cron:
+
+    python -m app.stale_predictions
+"""
+
+import asyncio
+import logging
+import uuid
+from datetime import timedelta
+
+import replicate
+from sqlalchemy import select
+
+from app.config import get_settings
+from app.core.inference import PredictionFailedError
+from app.db.config import SessionLocal
+from app.db.models import GenerationORM, Status, utcnow
+from app.schemas.replicate import PredictionWebhook
+from app.tasks import complete_prediction_task, fail_generation
+
+settings = get_settings()
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+"""The maximum number of generations polled by a single run."""
+
+
+async def find_stale_generations() -> list[tuple[uuid.UUID, str, bool]]:
+    """
+    Return the generations waiting on a prediction started more than `REPLICATE_WEBHOOK_DEADLINE` seconds ago,
+    with whether it started more than `REPLICATE_PREDICTION_TIMEOUT` seconds ago.
+    """
+
+    now = utcnow()
+    cutoff = now - timedelta(seconds=settings.REPLICATE_WEBHOOK_DEADLINE)
+    timed_out = GenerationORM.updated_at < now - timedelta(seconds=settings.REPLICATE_PREDICTION_TIMEOUT)
+    statement = (
+        select(GenerationORM.id, GenerationORM.prediction_id, timed_out.label("timed_out"))
+        .where(
+            GenerationORM.status == Status.IN_PROGRESS,
+            GenerationORM.prediction_id.is_not(None),
+            GenerationORM.updated_at < cutoff,
+        )
+        .order_by(GenerationORM.updated_at)
+        .limit(BATCH_SIZE)
+    )
+    async with SessionLocal() as session:
+        return [(row.id, row.prediction_id, row.timed_out) for row in await session.execute(statement)]
+
+
+async def recover_prediction(generation_id: uuid.UUID, prediction_id: str, timed_out: bool) -> None:
+    """Complete a generation from the state of its prediction, or fail it if the prediction ran for too long."""
+
+    prediction = PredictionWebhook.model_validate((await replicate.predictions.async_get(prediction_id)).dict())
+
+    if prediction.status == "succeeded":
+        # A failure to store the output leaves the generation waiting for the next run
+        await complete_prediction_task(generation_id, prediction.id, prediction.output_url, None, final_attempt=False)
+    elif prediction.status in ("failed", "canceled"):
+        error = prediction.error or f"The prediction was {prediction.status}"
+        await complete_prediction_task(generation_id, prediction.id, None, error)
+    elif timed_out:
+        await replicate.predictions.async_cancel(prediction_id)
+        timeout = settings.REPLICATE_PREDICTION_TIMEOUT
+        await fail_generation(
+            generation_id,
+            PredictionFailedError(f"The prediction did not finish within {timeout}s"),
+            final_attempt=True,
+        )
+
+
+async def recover_stale_predictions() -> int:
+    """Poll the predictions whose webhook is overdue and settle their generations. Returns how many were polled."""
+
+    stale = await find_stale_generations()
+    for generation_id, prediction_id, timed_out in stale:
+        try:
+            await recover_prediction(generation_id, prediction_id, timed_out)
+        except Exception:
+            logger.warning(
+                "Failed to recover prediction %s of generation %s", prediction_id, generation_id, exc_info=True
+            )
+    if stale:
+        logger.info("Polled %d predictions whose webhook is overdue", len(stale))
+    return len(stale)
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(recover_stale_predictions())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,69 +1,322 @@
+import asyncio
+import logging
+import posixpath
 import uuid
-from typing import cast
+from collections.abc import Sequence
+from typing import Any, cast
 
 import obstore as obs
 import replicate
+from obstore.exceptions import NotFoundError
 from replicate.helpers import FileOutput
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload
 
 from app.config import get_settings
-from app.core.storage import store
+from app.core.credits import refund_credits
+from app.core.events import publish_generation_status
+from app.core.images import create_derivatives, transcode_image
+from app.core.inference import PredictionFailedError, create_prediction, get_model_capabilities, run_model
+from app.core.metrics import GENERATION_STATUS_TRANSITIONS, STORAGE_OPERATION_DURATION
+from app.core.result_cache import CachedResult, result_cache, result_cache_key
+from app.core.storage import UploadResult, get_store, stream_upload, upload_bytes
 from app.db.config import SessionLocal
-from app.db.models import GenerationORM, Status
+from app.db.models import ContentType, GenerationORM, Status
+from app.object_gc import schedule_object_deletions
+from app.schemas.generations import GenerationStatus
 
 settings = get_settings()
 
-session = SessionLocal()
+logger = logging.getLogger(__name__)
 
 
-async def generate_image_task(generation_id: uuid.UUID) -> None:
+async def publish_status(generation_orm: GenerationORM) -> None:
+    """Count the status change of a generation and push it to the clients listening for it."""
+
+    GENERATION_STATUS_TRANSITIONS.labels(generation_orm.status).inc()
+    await publish_generation_status(generation_orm.user_id, GenerationStatus.model_validate(generation_orm))
+
+
+def get_model_input(generation_orm: GenerationORM) -> dict[str, Any]:
+    """Build the Replicate model input of a generation request, with the output options the model supports."""
+
+    capabilities = get_model_capabilities(settings.REPLICATE_MODEL_ID)
+    input: dict[str, Any] = {"prompt": generation_orm.prompt}
+    if generation_orm.seed is not None:
+        input["seed"] = generation_orm.seed
+    if generation_orm.ratio.value in capabilities.aspect_ratios:
+        input["aspect_ratio"] = generation_orm.ratio.value
+    if generation_orm.output_format.value in capabilities.output_formats:
+        input["output_format"] = generation_orm.output_format.value
+    if capabilities.output_quality:
+        input["output_quality"] = settings.IMAGE_QUALITY
+    return input
+
+
+def needs_transcoding(generation_orm: GenerationORM) -> bool:
+    """Check whether the model cannot produce the requested ratio or format by itself."""
+
+    capabilities = get_model_capabilities(settings.REPLICATE_MODEL_ID)
+    return (
+        generation_orm.ratio.value not in capabilities.aspect_ratios
+        or generation_orm.output_format.value not in capabilities.output_formats
+    )
+
+
+def get_output_location(generation_orm: GenerationORM) -> tuple[str, str]:
+    """Return a new object path and the content type for the output of a generation."""
+
+    filename = f"{generation_orm.user_id}/outputs/{uuid.uuid4().hex}.{generation_orm.output_format}"
+    content_type = ContentType[generation_orm.output_format.name]
+    return filename, content_type
+
+
+async def store_output(
+    generation_orm: GenerationORM, file_output: FileOutput, filename: str, content_type: str
+) -> UploadResult:
+    """
+    Store the output of a model in S3.
+    It is streamed as is when the model honored the requested ratio and format,
+    otherwise it is cropped and encoded in the process pool first.
+    """
+
+    if not needs_transcoding(generation_orm):
+        # Stream the generated image to S3 without holding it in memory
+        return await stream_upload(filename, file_output, content_type=content_type)
+
+    data = await file_output.aread()
+    data = await transcode_image(data, generation_orm.ratio.value, generation_orm.output_format.value)
+    return await upload_bytes(filename, data, content_type=content_type)
+
+
+def get_cache_key(generation_orm: GenerationORM) -> str | None:
+    """Return the result cache key of a generation, or None when the cache is disabled."""
+
+    if not settings.RESULT_CACHE_ENABLED:
+        return None
+
+    return result_cache_key(
+        model_id=settings.REPLICATE_MODEL_ID,
+        prompt=generation_orm.prompt,
+        ratio=generation_orm.ratio,
+        output_format=generation_orm.output_format,
+        seed=generation_orm.seed,
+        user_id=generation_orm.user_id,
+    )
+
+
+async def generate_output(generation_orm: GenerationORM, filename: str, content_type: str) -> UploadResult:
+    """Run the image generation model using Replicate and store its output in S3."""
+
+    output = await run_model(settings.REPLICATE_MODEL_ID, input=get_model_input(generation_orm))
+    output = cast(list[FileOutput], output)
+    return await store_output(generation_orm, output[0], filename, content_type)
+
+
+async def reuse_cached_result(cache_key: str, filename: str) -> UploadResult | None:
+    """Copy the output of an identical earlier request, if it is cached and still stored."""
+
+    cached = await result_cache.get(cache_key)
+    if cached is None:
+        return None
+
+    try:
+        with STORAGE_OPERATION_DURATION.labels("copy").time():
+            await obs.copy_async(get_store(), cached.filename, filename)
+    except NotFoundError:
+        # The original generation was deleted since
+        await result_cache.delete(cache_key)
+        return None
+
+    return UploadResult(size=cached.size, checksum=cached.checksum)
+
+
+async def start_prediction(generation_orm: GenerationORM) -> None:
+    """Start the prediction of a generation; it is completed by the Replicate webhook."""
+
+    webhook = f"{settings.BACKEND_HOST}/replicate/webhook?generation_id={generation_orm.id}"
+    prediction = await create_prediction(settings.REPLICATE_MODEL_ID, get_model_input(generation_orm), webhook)
+
+    async with SessionLocal() as session:
+        async with session.begin():
+            generation = await session.get(GenerationORM, generation_orm.id)
+            if not generation:
+                raise ValueError(f"Generation with ID {generation_orm.id} not found")
+            generation.prediction_id = prediction.id
+
+
+async def store_derivatives(filename: str) -> dict[str, str]:
+    """
+    Store the thumbnail and the preview of an output under `{user_id}/thumbs/`.
+    Returns their paths by name, or nothing if they could not be made; the lists then fall back to the original.
+    Outputs larger than `THUMBNAIL_MAX_SOURCE_SIZE` are skipped, since they are read in memory.
+    """
+
+    user_id, _, name = filename.split("/", 2)
+    stem = posixpath.splitext(posixpath.basename(name))[0]
+    try:
+        with STORAGE_OPERATION_DURATION.labels("get").time():
+            result = await obs.get_async(get_store(), filename)
+            size = result.meta["size"]
+            if size > settings.THUMBNAIL_MAX_SOURCE_SIZE:
+                logger.info("Skipped the thumbnails of %s, which has %d bytes", filename, size)
+                return {}
+            data = await result.bytes_async()
+        derivatives = await create_derivatives(data)
+        paths = {}
+        for derivative in derivatives:
+            path = f"{user_id}/thumbs/{stem}-{derivative.name}.{settings.THUMBNAIL_FORMAT}"
+            await upload_bytes(path, derivative.data, content_type=derivative.content_type)
+            paths[derivative.name] = path
+        return paths
+    except Exception:
+        logger.warning("Failed to create the thumbnails of %s", filename, exc_info=True)
+        return {}
+
+
+async def complete_generation(
+    generation_id: uuid.UUID, filename: str, content_type: str, upload: UploadResult
+) -> None:
+    """Record the stored output of a generation and its derivatives, and mark it as completed."""
+
+    derivatives = await store_derivatives(filename)
+
+    async with SessionLocal() as session:
+        async with session.begin():
+            generation_orm = await session.get(GenerationORM, generation_id)
+            if not generation_orm:
+                raise ValueError(f"Generation with ID {generation_id} not found")
+
+            generation_orm.status = Status.COMPLETED
+            generation_orm.size = upload.size
+            generation_orm.checksum = upload.checksum
+            generation_orm.filename = filename
+            generation_orm.content_type = content_type
+            generation_orm.thumbnail_filename = derivatives.get("thumbnail")
+            generation_orm.preview_filename = derivatives.get("preview")
+
+    await publish_status(generation_orm)
+
+
+async def fail_generation(
+    generation_id: uuid.UUID, err: Exception, final_attempt: bool, orphans: Sequence[str] = ()
+) -> None:
+    """
+    Record the failure of a generation.
+    On the final attempt it is marked as failed and its credits are refunded,
+    otherwise it goes back to pending to be retried.
+    The objects the failed attempt may have stored (`orphans`) are scheduled for deletion.
+    """
+
+    async with SessionLocal() as session:
+        async with session.begin():
+            generation_orm = await session.get(GenerationORM, generation_id, with_for_update=True)
+            if not generation_orm:
+                raise ValueError(f"Generation with ID {generation_id} not found")
+            if final_attempt and generation_orm.status != Status.FAILED and generation_orm.cost:
+                # Give back the credits reserved when the generation was created
+                await refund_credits(session, generation_orm.user_id, generation_orm.cost, generation_orm.id)
+            generation_orm.status = Status.FAILED if final_attempt else Status.PENDING
+            generation_orm.error_message = str(err)[:1024]
+            generation_orm.prediction_id = None
+
+            # Never delete the output of a generation that was recorded before the failure
+            referenced = {generation_orm.filename, generation_orm.thumbnail_filename, generation_orm.preview_filename}
+            await schedule_object_deletions(session, [path for path in orphans if path not in referenced])
+
+    await publish_status(generation_orm)
+
+
+async def generate_image_task(generation_id: uuid.UUID, final_attempt: bool = True) -> None:
+    """
+    Generate the image of a generation request and store it in S3.
+    When `final_attempt` is False, a failure puts the generation back to pending
+    so the job can be retried by the worker.
+    With `REPLICATE_WEBHOOKS_ENABLED`, the task only starts the prediction and
+    `complete_prediction_task` stores its output when Replicate calls back.
+    """
+
     async with SessionLocal() as session:
         async with session.begin():
             generation_orm = await session.get(GenerationORM, generation_id)
             if not generation_orm:
                 raise ValueError(f"Generation with ID {generation_id} not found")
+            if generation_orm.status in (Status.COMPLETED, Status.FAILED) or generation_orm.prediction_id:
+                # The job was redelivered after the generation was stored or its prediction started,
+                # or it was sent along with jobs the broker refused and the generation was failed
+                return
             generation_orm.status = Status.IN_PROGRESS
 
+    await publish_status(generation_orm)
+
+    filename, content_type = get_output_location(generation_orm)
     try:
-        # Run the image generation model using Replicate
-        model_id = settings.REPLICATE_MODEL_ID
-        input = {"prompt": generation_orm.prompt}
-        output = await replicate.async_run(model_id, input=input)
-        output = cast(list[FileOutput], output)
-
-        # Save the generated image to S3
-        file_output = output[0]
-        file_bytes = await file_output.aread()
-        filename = f"{generation_orm.user_id}/outputs/{uuid.uuid4().hex}.{generation_orm.output_format}"
-        await obs.put_async(store, filename, file_bytes)
-
-        # Update the generation record in the database
-        async with SessionLocal() as session:
-            async with session.begin():
-                statement = (
-                    select(GenerationORM)
-                    .options(selectinload(GenerationORM.user))
-                    .where(GenerationORM.id == generation_id)
-                )
-                result = await session.execute(statement)
-                generation_orm = result.scalar_one_or_none()
-
-                if not generation_orm:
-                    raise ValueError(f"Generation with ID {generation_id} not found")
-
-                generation_orm.status = Status.COMPLETED
-                generation_orm.size = len(file_bytes)
-                generation_orm.filename = filename
-                generation_orm.content_type = f"image/{generation_orm.output_format.value}"
-                generation_orm.user.credits -= settings.GENERATION_COST
+        cache_key = get_cache_key(generation_orm)
+        upload = await reuse_cached_result(cache_key, filename) if cache_key else None
+
+        if upload is None:
+            if settings.REPLICATE_WEBHOOKS_ENABLED:
+                await start_prediction(generation_orm)
+                return
+
+            upload = await generate_output(generation_orm, filename, content_type)
+            if cache_key:
+                await result_cache.set(cache_key, CachedResult(filename, upload.size, upload.checksum, content_type))
+
+        await complete_generation(generation_id, filename, content_type, upload)
+
+    except Exception as err:
+        await fail_generation(generation_id, err, final_attempt, orphans=[filename])
+        raise err
+
+    except asyncio.CancelledError:
+        # The worker cancels the job when it exceeds its time limit; record it even though the job is being cancelled
+        interrupted = TimeoutError("The generation job was interrupted, e.g. after exceeding its time limit")
+        await asyncio.shield(fail_generation(generation_id, interrupted, final_attempt, orphans=[filename]))
+        raise
+
+
+async def complete_prediction_task(
+    generation_id: uuid.UUID,
+    prediction_id: str,
+    output_url: str | None,
+    error: str | None,
+    final_attempt: bool = True,
+) -> None:
+    """
+    Store the output of a prediction reported by the Replicate webhook.
+    A failed prediction fails the generation right away, without retries.
+    """
+
+    async with SessionLocal() as session:
+        generation_orm = await session.get(GenerationORM, generation_id)
+        if not generation_orm:
+            raise ValueError(f"Generation with ID {generation_id} not found")
+        if generation_orm.status == Status.IN_PROGRESS and generation_orm.prediction_id is None:
+            # The callback raced the worker recording the prediction; the retry will find it
+            raise RuntimeError(f"Prediction {prediction_id} is not recorded yet")
+        if generation_orm.status == Status.COMPLETED or generation_orm.prediction_id != prediction_id:
+            # Duplicate delivery, or a prediction the generation no longer waits for
+            return
+
+    filename, content_type = get_output_location(generation_orm)
+    try:
+        if error or not output_url:
+            raise PredictionFailedError(error or "The prediction returned no output")
+
+        file_output = FileOutput(output_url, replicate.default_client)
+        upload = await store_output(generation_orm, file_output, filename, content_type)
+
+        cache_key = get_cache_key(generation_orm)
+        if cache_key:
+            await result_cache.set(cache_key, CachedResult(filename, upload.size, upload.checksum, content_type))
+
+        await complete_generation(generation_id, filename, content_type, upload)
+
+    except PredictionFailedError as err:
+        await fail_generation(generation_id, err, final_attempt=True)
 
     except Exception as err:
-        async with SessionLocal() as session:
-            async with session.begin():
-                generation_orm = await session.get(GenerationORM, generation_id)
-                if not generation_orm:
-                    raise ValueError(f"Generation with ID {generation_id} not found")
-                generation_orm.status = Status.FAILED
-                generation_orm.error_message = str(err)[1024:]
-            raise err
+        # The generation keeps waiting on the prediction until the last retry;
+        # outputs stored by earlier attempts are left to the reconciliation
+        if final_attempt:
+            await fail_generation(generation_id, err, final_attempt=True, orphans=[filename])
+        raise err
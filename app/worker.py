@@ -0,0 +1,35 @@
+"""
+Entrypoint for the background workers.
+
+Starts the dramatiq workers with the process and thread counts taken from the settings,
+so web replicas and workers can be scaled independently:
+
+    python -m app.worker [extra dramatiq arguments]
+"""
+
+import sys
+
+from dramatiq.cli import main as dramatiq_main
+from dramatiq.cli import make_argument_parser
+
+from app.config import get_settings
+
+settings = get_settings()
+
+
+def main() -> int:
+    args = make_argument_parser().parse_args(  # type: ignore[no-untyped-call]
+        [
+            "app.dramatiq_app",
+            "--processes",
+            str(settings.WORKER_PROCESSES),
+            "--threads",
+            str(settings.WORKER_THREADS),
+            *sys.argv[1:],
+        ]
+    )
+    return int(dramatiq_main(args) or 0)  # type: ignore[no-untyped-call]
+
+
+if __name__ == "__main__":
+    sys.exit(main())
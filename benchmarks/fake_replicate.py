@@ -0,0 +1,164 @@
+"""
+Local stand-in for the Replicate API, for tests and load runs without a Replicate account.
+
+Point the backend and the workers at it with `REPLICATE_BASE_URL=http://localhost:5005` and start it with:
+
+    python -m benchmarks.fake_replicate
+
+It answers the prediction endpoints used by the app with generated images, and calls
+the prediction webhooks signed with `FAKE_REPLICATE_WEBHOOK_SECRET`, which should be used as
+`REPLICATE_WEBHOOK_SECRET` by the backend. Its behavior is configured with the environment:
+
+- `FAKE_REPLICATE_URL`: the URL at which the server is reachable (default `http://localhost:5005`)
+- `FAKE_REPLICATE_LATENCY`: the seconds a prediction takes to run (default 1)
+- `FAKE_REPLICATE_ERROR_RATE`: the share of predictions that fail (default 0)
+- `FAKE_REPLICATE_THROTTLE_RATE`: the share of prediction requests answered with a 429 (default 0)
+"""
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import io
+import json
+import logging
+import os
+import random
+import time
+import uuid
+from datetime import UTC, datetime
+from typing import Any
+
+import httpx
+import uvicorn
+from fastapi import BackgroundTasks, FastAPI, HTTPException, Request
+from PIL import Image
+
+BASE_URL = os.environ.get("FAKE_REPLICATE_URL", "http://localhost:5005")
+LATENCY = float(os.environ.get("FAKE_REPLICATE_LATENCY", "1"))
+ERROR_RATE = float(os.environ.get("FAKE_REPLICATE_ERROR_RATE", "0"))
+THROTTLE_RATE = float(os.environ.get("FAKE_REPLICATE_THROTTLE_RATE", "0"))
+WEBHOOK_SECRET = os.environ.get("FAKE_REPLICATE_WEBHOOK_SECRET", "whsec_ZmFrZS1yZXBsaWNhdGUtd2ViaG9vay1zZWNyZXQ=")
+
+logger = logging.getLogger(__name__)
+
+app = FastAPI(title="Fake Replicate")
+
+predictions: dict[str, dict[str, Any]] = {}
+
+
+def now() -> str:
+    return datetime.now(UTC).isoformat()
+
+
+def make_image(seed: str, aspect_ratio: str, output_format: str, size: int = 512) -> tuple[bytes, str]:
+    """Build a solid color image whose color depends on `seed`, honoring the Flux output options."""
+
+    width_ratio, height_ratio = (int(part) for part in aspect_ratio.split(":"))
+    scale = size / max(width_ratio, height_ratio)
+    width, height = round(width_ratio * scale), round(height_ratio * scale)
+    color = tuple(hashlib.sha256(seed.encode()).digest()[:3])
+    pil_format = {"jpg": "JPEG", "png": "PNG", "webp": "WEBP"}[output_format]
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), color).save(buffer, format=pil_format)
+    return buffer.getvalue(), Image.MIME[pil_format]
+
+
+def sign_webhook(webhook_id: str, timestamp: str, body: str) -> str:
+    """Sign a webhook call the way Replicate does."""
+
+    key = base64.b64decode(WEBHOOK_SECRET.removeprefix("whsec_"))
+    digest = hmac.new(key, f"{webhook_id}.{timestamp}.{body}".encode(), hashlib.sha256).digest()
+    return f"v1,{base64.b64encode(digest).decode()}"
+
+
+async def run_prediction(prediction_id: str) -> None:
+    """Complete a prediction after the configured latency and call its webhook."""
+
+    prediction = predictions[prediction_id]
+    prediction.update(status="processing", started_at=now())
+    await asyncio.sleep(LATENCY)
+    if prediction["status"] == "canceled":
+        return
+
+    if random.random() < ERROR_RATE:
+        prediction.update(status="failed", error="Fake prediction failure")
+    else:
+        input = prediction["input"]
+        data, content_type = make_image(
+            prediction_id, input.get("aspect_ratio", "1:1"), input.get("output_format", "webp")
+        )
+        # Outputs are data URLs since the client only downloads `https:` and `data:` outputs
+        prediction.update(status="succeeded", output=[f"data:{content_type};base64,{base64.b64encode(data).decode()}"])
+    prediction["completed_at"] = now()
+
+    webhook = prediction.pop("webhook", None)
+    if not webhook:
+        return
+
+    body = json.dumps(prediction)
+    webhook_id = f"msg_{uuid.uuid4().hex}"
+    timestamp = str(int(time.time()))
+    headers = {
+        "content-type": "application/json",
+        "webhook-id": webhook_id,
+        "webhook-timestamp": timestamp,
+        "webhook-signature": sign_webhook(webhook_id, timestamp, body),
+    }
+    try:
+        async with httpx.AsyncClient() as client:
+            await client.post(webhook, content=body, headers=headers)
+    except httpx.HTTPError:
+        logger.warning("Failed to call the webhook of prediction %s", prediction_id, exc_info=True)
+
+
+@app.post("/v1/models/{owner}/{name}/predictions", status_code=201)
+async def create_prediction(owner: str, name: str, request: Request, background_tasks: BackgroundTasks) -> Any:
+    if random.random() < THROTTLE_RATE:
+        raise HTTPException(status_code=429, detail="Request was throttled")
+
+    data = await request.json()
+    prediction_id = uuid.uuid4().hex[:26]
+    predictions[prediction_id] = {
+        "id": prediction_id,
+        "model": f"{owner}/{name}",
+        "version": "fake",
+        "status": "starting",
+        "input": data.get("input", {}),
+        "output": None,
+        "logs": "",
+        "error": None,
+        "metrics": {},
+        "created_at": now(),
+        "started_at": None,
+        "completed_at": None,
+        "urls": {
+            "get": f"{BASE_URL}/v1/predictions/{prediction_id}",
+            "cancel": f"{BASE_URL}/v1/predictions/{prediction_id}/cancel",
+        },
+        "webhook": data.get("webhook"),
+    }
+    background_tasks.add_task(run_prediction, prediction_id)
+    return {key: value for key, value in predictions[prediction_id].items() if key != "webhook"}
+
+
+@app.get("/v1/predictions/{prediction_id}")
+async def get_prediction(prediction_id: str) -> Any:
+    if prediction_id not in predictions:
+        raise HTTPException(status_code=404, detail="Prediction not found")
+    return {key: value for key, value in predictions[prediction_id].items() if key != "webhook"}
+
+
+@app.post("/v1/predictions/{prediction_id}/cancel")
+async def cancel_prediction(prediction_id: str) -> Any:
+    if prediction_id not in predictions:
+        raise HTTPException(status_code=404, detail="Prediction not found")
+    prediction = predictions[prediction_id]
+    if prediction["status"] in ("starting", "processing"):
+        prediction.update(status="canceled", completed_at=now())
+    return {key: value for key, value in prediction.items() if key != "webhook"}
+
+
+if __name__ == "__main__":
+    uvicorn.run(app, host="0.0.0.0", port=int(os.environ.get("FAKE_REPLICATE_PORT", "5005")))
@@ -0,0 +1,118 @@
+"""
+Microbenchmark of the serialization of a page of `GET /generations`.
+
+Compares the former path, which validated every row into `GenerationData` and then had FastAPI
+validate and encode the page against `response_model=GenerationList`, with the current one,
+which encodes the fields of the rows straight to JSON with a `PydanticJSONResponse`:
+
+    python -m benchmarks.generation_list_serialization [--limit 100] [--number 500]
+
+Signing is left out: both paths are given the same URLs.
+"""
+
+import argparse
+import json
+import timeit
+import tracemalloc
+import uuid
+from collections.abc import Callable
+from datetime import UTC, datetime, timedelta
+
+from pydantic import TypeAdapter
+from starlette.responses import JSONResponse
+
+from app.api.responses import PydanticJSONResponse
+from app.api.routes.generation_routes import to_generation_data
+from app.db.models import ContentType, GenerationORM, OutputFormat, Ratio, Status
+from app.schemas.generations import GenerationData, GenerationList
+
+# How FastAPI checks and encodes what a route returns against its `response_model`
+response_adapter = TypeAdapter(GenerationList)
+
+
+def make_page(limit: int) -> list[GenerationORM]:
+    """Build a page of completed generations with their derivatives, as loaded from the database."""
+
+    user_id = uuid.uuid4()
+    now = datetime.now(UTC)
+    page = []
+    for index in range(limit):
+        generation_id = uuid.uuid4()
+        page.append(
+            GenerationORM(
+                id=generation_id,
+                user_id=user_id,
+                prompt=f"A watercolor painting of a lighthouse at dawn, variation {index}",
+                created_at=now - timedelta(minutes=index),
+                updated_at=now - timedelta(minutes=index),
+                output_format=OutputFormat.PNG,
+                ratio=Ratio.RATIO_16_9,
+                seed=index,
+                status=Status.COMPLETED,
+                filename=f"{user_id}/outputs/{generation_id.hex}.png",
+                size=1_234_567,
+                content_type=ContentType.PNG,
+                checksum="0" * 64,
+                thumbnail_filename=f"{user_id}/thumbs/{generation_id.hex}-thumbnail.webp",
+                preview_filename=f"{user_id}/thumbs/{generation_id.hex}-preview.webp",
+            )
+        )
+    return page
+
+
+def get_urls(generation_orm: GenerationORM) -> tuple[str, str]:
+    """Stand in for the signed preview and thumbnail URLs, which both paths get from the same cache."""
+    return (
+        f"https://s3.example.com/bucket/{generation_orm.preview_filename}?X-Amz-Signature={'0' * 64}",
+        f"https://s3.example.com/bucket/{generation_orm.thumbnail_filename}?X-Amz-Signature={'0' * 64}",
+    )
+
+
+def before(page: list[GenerationORM]) -> bytes:
+    data = []
+    for generation_orm in page:
+        generation_data = GenerationData.model_validate(generation_orm)
+        generation_data.preview_url, generation_data.thumbnail_url = get_urls(generation_orm)
+        data.append(generation_data)
+    content = GenerationList(count=len(page), data=data, next_cursor=None)
+
+    value = response_adapter.validate_python(content, from_attributes=True)
+    return bytes(JSONResponse(response_adapter.dump_python(value, mode="json", by_alias=True)).body)
+
+
+def after(page: list[GenerationORM]) -> bytes:
+    data = [to_generation_data(generation_orm, *get_urls(generation_orm)) for generation_orm in page]
+    return bytes(PydanticJSONResponse({"count": len(page), "data": data, "next_cursor": None}).body)
+
+
+def measure(name: str, serialize: Callable[[], bytes], number: int, baseline: float | None = None) -> float:
+    per_page = min(timeit.repeat(serialize, number=number, repeat=5)) / number
+
+    tracemalloc.start()
+    serialize()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    line = f"{name:<8} {per_page * 1e3:8.3f} ms/page  {peak / 1024:8.1f} KiB peak"
+    if baseline:
+        line += f"  ({baseline / per_page:.1f}x faster)"
+    print(line)
+    return per_page
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--limit", type=int, default=100, help="generations per page")
+    parser.add_argument("--number", type=int, default=500, help="pages per measurement")
+    args = parser.parse_args()
+
+    page = make_page(args.limit)
+    assert json.loads(before(page)) == json.loads(after(page))
+
+    print(f"Pages of {args.limit} generations, best of 5 runs of {args.number} pages")
+    baseline = measure("before", lambda: before(page), args.number)
+    measure("after", lambda: after(page), args.number, baseline)
+
+
+if __name__ == "__main__":
+    main()
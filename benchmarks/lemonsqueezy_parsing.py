@@ -0,0 +1,124 @@
+"""
+Microbenchmark of the parsing of a LemonSqueezy order webhook.
+
+Compares the full `OrderResponse` model with the `OrderCallback` model the callback uses,
+which only validates the fields needed to credit the buyer:
+
+    python -m benchmarks.lemonsqueezy_parsing [--number 20000]
+"""
+
+import argparse
+import json
+import timeit
+from collections.abc import Callable
+from typing import Any
+
+from app.schemas.lemonsqueezy import OrderCallback, OrderResponse
+
+TIMESTAMP = "2026-01-01T12:00:00.000000Z"
+URL = "https://api.lemonsqueezy.com/v1/orders/1"
+
+
+def make_payload() -> bytes:
+    """Build an `order_created` webhook body shaped like the ones LemonSqueezy sends."""
+
+    relationship = {"links": {"self": f"{URL}/relationships/x", "related": f"{URL}/x"}}
+    attributes: dict[str, Any] = {
+        "tax": 0,
+        "urls": {"receipt": "https://app.lemonsqueezy.com/my-orders/1?signature=abc"},
+        "total": 999,
+        "status": "paid",
+        "tax_usd": 0,
+        "currency": "USD",
+        "refunded": False,
+        "store_id": 1,
+        "subtotal": 999,
+        "tax_name": "VAT",
+        "tax_rate": 0.0,
+        "setup_fee": 0,
+        "test_mode": False,
+        "total_usd": 999,
+        "user_name": "Jane Doe",
+        "created_at": TIMESTAMP,
+        "identifier": "104e18a2-d755-4d4b-80c4-a6c1dcbe1c10",
+        "updated_at": TIMESTAMP,
+        "user_email": "jane@example.com",
+        "customer_id": 1,
+        "refunded_at": None,
+        "order_number": 1,
+        "subtotal_usd": 999,
+        "currency_rate": "1.0000",
+        "setup_fee_usd": 0,
+        "tax_formatted": "$0.00",
+        "tax_inclusive": False,
+        "discount_total": 0,
+        "refunded_amount": 0,
+        "total_formatted": "$9.99",
+        "first_order_item": {
+            "id": 1,
+            "price": 999,
+            "order_id": 1,
+            "price_id": 1,
+            "quantity": 1,
+            "test_mode": False,
+            "created_at": TIMESTAMP,
+            "product_id": 1,
+            "updated_at": TIMESTAMP,
+            "variant_id": 1,
+            "product_name": "500 credits",
+            "variant_name": "Default",
+        },
+        "status_formatted": "Paid",
+        "discount_total_usd": 0,
+        "subtotal_formatted": "$9.99",
+        "refunded_amount_usd": 0,
+        "setup_fee_formatted": "$0.00",
+        "discount_total_formatted": "$0.00",
+        "refunded_amount_formatted": "$0.00",
+    }
+    payload = {
+        "data": {
+            "id": "1",
+            "type": "orders",
+            "links": {"self": URL},
+            "attributes": attributes,
+            "relationships": dict.fromkeys(
+                ("store", "customer", "order-items", "license-keys", "subscriptions", "discount-redemptions"),
+                relationship,
+            ),
+        },
+        "meta": {"test_mode": False, "event_name": "order_created", "webhook_id": "1"},
+    }
+    return json.dumps(payload).encode()
+
+
+def measure(name: str, parse: Callable[[], object], number: int, baseline: float | None = None) -> float:
+    per_call = min(timeit.repeat(parse, number=number, repeat=5)) / number
+    line = f"{name:<34} {per_call * 1e6:8.2f} µs/webhook"
+    if baseline:
+        line += f"  ({baseline / per_call:.1f}x faster)"
+    print(line)
+    return per_call
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=20_000, help="parses per measurement")
+    args = parser.parse_args()
+
+    body = make_payload()
+    full = OrderResponse.model_validate_json(body)
+    lean = OrderCallback.model_validate_json(body)
+    assert full.data.attributes.identifier == lean.data.attributes.identifier
+
+    print(f"Payload of {len(body)} bytes, best of 5 runs of {args.number} parses")
+    baseline = measure(
+        "OrderResponse.model_validate_json", lambda: OrderResponse.model_validate_json(body), args.number
+    )
+    measure(
+        "OrderCallback.model_validate_json", lambda: OrderCallback.model_validate_json(body), args.number, baseline
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,513 @@
+"""
+Load test of the application against local stand-ins for its backends.
+
+Serves the application with uvicorn and runs its workers in the same process, with:
+
+- SQLite through aiosqlite in place of Postgres, or the database given with `--database-url`,
+  e.g. `postgresql+asyncpg://postgres@localhost/load` for a local Postgres,
+- objects kept in memory (`STORAGE_BACKEND=memory`) in place of S3,
+- jobs handed to the workers through the in-memory broker (`TASK_BROKER=stub`),
+- `benchmarks.fake_replicate` in place of Replicate, which completes the predictions through the webhook.
+
+Virtual users, each signed in to their own account, send a weighted mix of generation requests,
+list pages, status polls, detail and download requests, and the predictions call the webhook on top.
+The latency percentiles and the throughput of every endpoint are measured in the application,
+after a warm-up, and written as JSON with the commit and the options, to compare runs between commits:
+
+    python -m benchmarks.load [--duration 60] [--users 50] [--output load.json] [--baseline previous.json]
+
+The load is generated in the same process as the application, so numbers are only comparable on the same machine.
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import math
+import os
+import platform
+import random
+import secrets
+import subprocess
+import tempfile
+import time
+import uuid
+from collections import Counter, defaultdict
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any
+
+import httpx
+import uvicorn
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+DEFAULT_MIX = "create=1,list=3,status=6,detail=1,download=1"
+
+PROMPTS = (
+    "A watercolor painting of a lighthouse at dawn",
+    "An isometric illustration of a tiny island with a castle",
+    "A photograph of a red fox in the snow, 85mm",
+    "A neon-lit street in the rain at night, cinematic",
+)
+RATIOS = ("1:1", "16:9", "4:3")
+OUTPUT_FORMATS = ("png", "jpg")
+
+ROOT = Path(__file__).resolve().parents[1]
+
+DRAIN_TIMEOUT = 30
+"""The seconds given to the running generations to finish once the load stopped."""
+
+
+def configure_environment(args: argparse.Namespace) -> None:
+    """Point the settings at the stand-ins. It must run before the application modules are imported."""
+
+    secret = f"whsec_{base64.b64encode(secrets.token_bytes(24)).decode()}"
+    replicate_url = f"http://127.0.0.1:{args.replicate_port}"
+    os.environ.update(
+        TASK_BROKER="stub",
+        STATE_BACKEND="memory",
+        STORAGE_BACKEND="memory",
+        BACKEND_HOST=f"http://127.0.0.1:{args.port}",
+        REPLICATE_BASE_URL=replicate_url,
+        REPLICATE_WEBHOOKS_ENABLED="true",
+        REPLICATE_WEBHOOK_SECRET=secret,
+        FAKE_REPLICATE_URL=replicate_url,
+        FAKE_REPLICATE_WEBHOOK_SECRET=secret,
+        FAKE_REPLICATE_LATENCY=str(args.replicate_latency),
+        FAKE_REPLICATE_ERROR_RATE=str(args.replicate_error_rate),
+        FAKE_REPLICATE_THROTTLE_RATE=str(args.replicate_throttle_rate),
+        WORKER_THREADS=str(args.worker_threads),
+    )
+    # Required by the settings, but unused unless `--database-url` is a Postgres URL
+    os.environ.setdefault("POSTGRES_SERVER", "localhost")
+    os.environ.setdefault("POSTGRES_USER", "postgres")
+    os.environ.setdefault("REPLICATE_API_TOKEN", "fake")
+
+
+def parse_mix(value: str) -> dict[str, float]:
+    """Parse the weights of the operations, given as `name=weight,...`."""
+
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        if name.strip() not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"Unknown operation {name!r}, expected one of {', '.join(OPERATIONS)}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+@dataclass
+class Sample:
+    endpoint: str
+    status: int
+    duration: float
+
+
+class Recorder:
+    """
+    ASGI middleware keeping the duration of every HTTP request while `enabled`,
+    labelled with the route template like `MetricsMiddleware`.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self.enabled = False
+        self.samples: list[Sample] = []
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if self.enabled:
+                route = getattr(scope.get("route"), "path", "unmatched")
+                self.samples.append(Sample(f"{scope['method']} {route}", status, time.perf_counter() - start))
+
+
+@dataclass
+class VirtualUser:
+    """A signed in client and the generations it knows about."""
+
+    client: httpx.AsyncClient
+    rng: random.Random
+    pending: list[str] = field(default_factory=list)
+    completed: list[str] = field(default_factory=list)
+    etags: dict[str, str] = field(default_factory=dict)
+    created: int = 0
+
+
+async def create(user: VirtualUser) -> None:
+    data = {
+        "prompt": user.rng.choice(PROMPTS),
+        "ratio": user.rng.choice(RATIOS),
+        "output_format": user.rng.choice(OUTPUT_FORMATS),
+    }
+    response = await user.client.post("/generations/create", data=data)
+    if response.status_code == 202:
+        user.pending.append(response.json()["generation_id"])
+        user.created += 1
+
+
+async def list_page(user: VirtualUser) -> None:
+    await user.client.get("/generations", params={"limit": 20})
+
+
+async def poll_status(user: VirtualUser) -> None:
+    """Poll a pending generation like the frontend does, with the ETag of the previous answer."""
+
+    if not user.pending:
+        await detail(user)
+        return
+
+    generation_id = user.rng.choice(user.pending)
+    headers = {"If-None-Match": user.etags[generation_id]} if generation_id in user.etags else {}
+    response = await user.client.get(f"/generations/{generation_id}/status", headers=headers)
+    if response.status_code != 200:
+        return
+
+    user.etags[generation_id] = response.headers["etag"]
+    if response.json()["status"] in ("COMPLETED", "FAILED"):
+        user.pending.remove(generation_id)
+        del user.etags[generation_id]
+        if response.json()["status"] == "COMPLETED":
+            user.completed.append(generation_id)
+
+
+async def detail(user: VirtualUser) -> None:
+    if user.completed:
+        await user.client.get(f"/generations/{user.rng.choice(user.completed)}")
+
+
+async def download(user: VirtualUser) -> None:
+    if user.completed:
+        await user.client.get(f"/generations/{user.rng.choice(user.completed)}/download")
+
+
+OPERATIONS: dict[str, Callable[[VirtualUser], Awaitable[None]]] = {
+    "create": create,
+    "list": list_page,
+    "status": poll_status,
+    "detail": detail,
+    "download": download,
+}
+
+
+async def run_user(user: VirtualUser, mix: dict[str, float], think_time: float, stop: asyncio.Event) -> int:
+    """Send operations drawn from `mix` until `stop` is set, and return the number of client-side failures."""
+
+    names, weights = list(mix), list(mix.values())
+    failures = 0
+    while not stop.is_set():
+        try:
+            await OPERATIONS[user.rng.choices(names, weights)[0]](user)
+        except httpx.HTTPError:
+            failures += 1
+        if think_time:
+            await asyncio.sleep(user.rng.expovariate(1 / think_time))
+    return failures
+
+
+async def seed(users: int, generations: int) -> list[tuple[uuid.UUID, str, list[str]]]:
+    """Create the accounts of the virtual users with enough credits and `generations` completed ones each."""
+
+    from sqlalchemy import insert
+
+    from app.db.config import SessionLocal
+    from app.db.models import ContentType, GenerationORM, OutputFormat, Ratio, Status, UserORM
+
+    accounts = []
+    user_rows: list[dict[str, Any]] = []
+    generation_rows: list[dict[str, Any]] = []
+    for _ in range(users):
+        user_id = uuid.uuid4()
+        email = f"load-{user_id.hex[:12]}@example.com"
+        user_rows.append(
+            {"id": user_id, "google_id": f"load-{user_id.hex}", "name": "Load test", "email": email, "credits": 10**9}
+        )
+        generation_ids = [uuid.uuid4() for _ in range(generations)]
+        accounts.append((user_id, email, [str(generation_id) for generation_id in generation_ids]))
+        generation_rows.extend(
+            {
+                "id": generation_id,
+                "user_id": user_id,
+                "prompt": PROMPTS[index % len(PROMPTS)],
+                "output_format": OutputFormat.PNG,
+                "ratio": Ratio.RATIO_1_1,
+                "status": Status.COMPLETED,
+                "filename": f"{user_id}/outputs/{generation_id.hex}.png",
+                "size": 1_234_567,
+                "content_type": ContentType.PNG,
+                "checksum": "0" * 64,
+                "thumbnail_filename": f"{user_id}/thumbs/{generation_id.hex}-thumbnail.webp",
+                "preview_filename": f"{user_id}/thumbs/{generation_id.hex}-preview.webp",
+            }
+            for index, generation_id in enumerate(generation_ids)
+        )
+
+    async with SessionLocal() as session:
+        async with session.begin():
+            await session.execute(insert(UserORM), user_rows)
+            if generation_rows:
+                await session.execute(insert(GenerationORM), generation_rows)
+    return accounts
+
+
+async def start_server(app: ASGIApp, port: int) -> tuple[uvicorn.Server, asyncio.Task[None]]:
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=port, lifespan="off", log_level="warning", access_log=False)
+    )
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        if task.done():
+            task.result()
+        await asyncio.sleep(0.01)
+    return server, task
+
+
+async def count_generations(since: datetime) -> dict[str, int]:
+    """Count the generations created since the start of the run by status."""
+
+    from sqlalchemy import func, select
+
+    from app.db.config import SessionLocal
+    from app.db.models import GenerationORM
+
+    statement = (
+        select(GenerationORM.status, func.count())
+        .where(GenerationORM.created_at >= since)
+        .group_by(GenerationORM.status)
+    )
+    async with SessionLocal() as session:
+        return {status.value: count for status, count in await session.execute(statement)}
+
+
+async def drain(since: datetime, timeout: float) -> bool:
+    """Wait for the generations created since the start of the run to complete or fail, at most `timeout` seconds."""
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        counts = await count_generations(since)
+        if not counts.get("PENDING") and not counts.get("IN_PROGRESS"):
+            return True
+        await asyncio.sleep(0.5)
+    return False
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    """Start the application and the fake Replicate, apply the load and return the results."""
+
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    from app.config import get_settings
+    from app.core.security import create_session_token
+    from app.db.config import SessionLocal, create_engine
+    from app.db.models import Base
+    from app.main import init_app
+    from benchmarks import fake_replicate
+
+    settings = get_settings()
+
+    with tempfile.TemporaryDirectory() as directory:
+        database_url = args.database_url or f"sqlite+aiosqlite:///{directory}/load.db"
+        if database_url.startswith("sqlite"):
+            engine = create_async_engine(database_url, connect_args={"timeout": 60})
+        else:
+            engine = create_engine(database_url)
+        SessionLocal.configure(bind=engine)
+
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+        accounts = await seed(args.users, args.seed_generations)
+
+        recorder = Recorder(init_app())
+        app_server, app_task = await start_server(recorder, args.port)
+        replicate_server, replicate_task = await start_server(fake_replicate.app, args.replicate_port)
+
+        stop = asyncio.Event()
+        limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+        clients = []
+        users = []
+        for index, (user_id, email, generation_ids) in enumerate(accounts):
+            token = create_session_token(user_id, email, expires_in=args.warmup + args.duration + 3600)
+            client = httpx.AsyncClient(
+                base_url=settings.BACKEND_HOST,
+                cookies={settings.SESSION_COOKIE_NAME: token},
+                limits=limits,
+                timeout=60,
+            )
+            clients.append(client)
+            users.append(VirtualUser(client, random.Random(args.seed + index), completed=list(generation_ids)))
+
+        started_at = datetime.now(UTC)
+        tasks = [asyncio.create_task(run_user(user, args.mix, args.think_time, stop)) for user in users]
+        try:
+            await asyncio.sleep(args.warmup)
+            recorder.enabled = True
+            start = time.perf_counter()
+            await asyncio.sleep(args.duration)
+            recorder.enabled = False
+            elapsed = time.perf_counter() - start
+        finally:
+            stop.set()
+            failures = sum(await asyncio.gather(*tasks))
+            for client in clients:
+                await client.aclose()
+
+        generations = await count_generations(started_at)
+
+        # Let the workers and the fake Replicate finish the generations before the database goes away
+        if not await drain(started_at, DRAIN_TIMEOUT):
+            print(f"Generations were still running {DRAIN_TIMEOUT} seconds after the load stopped")
+        replicate_server.should_exit = app_server.should_exit = True
+        await asyncio.gather(replicate_task, app_task)
+        await engine.dispose()
+
+    return {
+        "duration": elapsed,
+        "endpoints": summarize(recorder.samples, elapsed),
+        "client_failures": failures,
+        "generations": {"created": sum(user.created for user in users), **generations},
+    }
+
+
+def percentile(durations: list[float], q: float) -> float:
+    """Nearest-rank percentile of sorted durations."""
+    return durations[max(math.ceil(q / 100 * len(durations)) - 1, 0)]
+
+
+def summarize(samples: list[Sample], elapsed: float) -> dict[str, dict[str, Any]]:
+    """Compute the throughput, the latency percentiles in milliseconds and the status counts of each endpoint."""
+
+    by_endpoint: dict[str, list[Sample]] = defaultdict(list)
+    for sample in samples:
+        by_endpoint[sample.endpoint].append(sample)
+
+    summary = {}
+    for endpoint, endpoint_samples in sorted(by_endpoint.items()):
+        durations = sorted(sample.duration * 1e3 for sample in endpoint_samples)
+        summary[endpoint] = {
+            "requests": len(durations),
+            "throughput": len(durations) / elapsed,
+            "p50": percentile(durations, 50),
+            "p95": percentile(durations, 95),
+            "p99": percentile(durations, 99),
+            "max": durations[-1],
+            "statuses": dict(sorted(Counter(str(sample.status) for sample in endpoint_samples).items())),
+        }
+    return summary
+
+
+def get_commit() -> dict[str, Any]:
+    """Return the checked out commit and whether the tree has uncommitted changes, if run from a git checkout."""
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout
+        status = subprocess.run(
+            ["git", "status", "--porcelain"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+    return {"commit": commit.strip(), "dirty": bool(status.strip())}
+
+
+def report(results: dict[str, Any], baseline: dict[str, Any] | None) -> None:
+    """Print the results, with the relative change of each figure from `baseline` if given."""
+
+    def change(endpoint: str, name: str, value: float) -> str:
+        previous = (baseline or {}).get("endpoints", {}).get(endpoint, {}).get(name)
+        return f"{(value / previous - 1) * 100:+6.1f}%" if previous else ""
+
+    print(f"{'endpoint':<44} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}  statuses")
+    for endpoint, stats in results["endpoints"].items():
+        statuses = " ".join(f"{status}:{count}" for status, count in stats["statuses"].items())
+        print(
+            f"{endpoint:<44} {stats['throughput']:8.1f} {stats['p50']:8.2f} {stats['p95']:8.2f} {stats['p99']:8.2f}"
+            f"  {statuses}"
+        )
+        if baseline:
+            changes = [change(endpoint, name, stats[name]) for name in ("throughput", "p50", "p95", "p99")]
+            print(f"{'  vs baseline':<44} {changes[0]:>8} {changes[1]:>8} {changes[2]:>8} {changes[3]:>8}")
+
+    print(f"Generations: {results['generations']}, client failures: {results['client_failures']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=60, help="seconds measured")
+    parser.add_argument("--warmup", type=float, default=10, help="seconds of load before the measurement")
+    parser.add_argument("--users", type=int, default=50, help="concurrent virtual users, one account each")
+    parser.add_argument("--think-time", type=float, default=0.1, help="mean pause in seconds between two operations")
+    parser.add_argument(
+        "--mix", type=parse_mix, default=DEFAULT_MIX, help=f"operation weights (default {DEFAULT_MIX})"
+    )
+    parser.add_argument("--seed-generations", type=int, default=100, help="completed generations per account")
+    parser.add_argument("--database-url", help="async SQLAlchemy URL of the database, a temporary SQLite by default")
+    parser.add_argument("--replicate-latency", type=float, default=1, help="seconds a fake prediction takes")
+    parser.add_argument("--replicate-error-rate", type=float, default=0, help="share of fake predictions that fail")
+    parser.add_argument("--replicate-throttle-rate", type=float, default=0, help="share of throttled predictions")
+    parser.add_argument("--worker-threads", type=int, default=8, help="worker threads running the jobs")
+    parser.add_argument("--port", type=int, default=8765, help="port of the application")
+    parser.add_argument("--replicate-port", type=int, default=8766, help="port of the fake Replicate")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random choices of the virtual users")
+    parser.add_argument("--output", type=Path, default=Path("load-results.json"), help="JSON file of the results")
+    parser.add_argument("--baseline", type=Path, help="JSON results of an earlier run to compare with")
+    args = parser.parse_args()
+
+    configure_environment(args)
+
+    from dramatiq import Worker
+    from dramatiq.asyncio import get_event_loop_thread
+    from dramatiq.middleware.prometheus import Prometheus
+    from sqlalchemy import make_url
+
+    from app.dramatiq_app import broker
+
+    # The metrics of dramatiq are only set up by its command line, when it boots the worker processes
+    broker.middleware[:] = [middleware for middleware in broker.middleware if not isinstance(middleware, Prometheus)]
+
+    # The application, the fake Replicate and the load all run on the event loop of the workers,
+    # so the connections of the database engine are only ever used from a single loop
+    worker = Worker(broker, worker_threads=args.worker_threads)  # type: ignore[no-untyped-call]
+    worker.start()  # type: ignore[no-untyped-call]
+    try:
+        event_loop_thread = get_event_loop_thread()
+        assert event_loop_thread is not None
+        results = event_loop_thread.run_coroutine(run(args))
+    finally:
+        worker.stop()  # type: ignore[no-untyped-call]
+
+    options = {name: value for name, value in vars(args).items() if name not in ("output", "baseline")}
+    if args.database_url:
+        options["database_url"] = make_url(args.database_url).render_as_string(hide_password=True)
+    results = {
+        **get_commit(),
+        "created_at": datetime.now(UTC).isoformat(),
+        "python": platform.python_version(),
+        "options": options,
+        **results,
+    }
+    args.output.write_text(json.dumps(results, indent=2, default=str))
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline else None
+    report(results, baseline)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Benchmark of the cold start of the web application.
+
+Starts fresh interpreters and measures, for each of them:
+
+- the time to import `app.main`,
+- the time from the interpreter start to the response of a first request (`GET /metrics`),
+  with the application lifespan run as uvicorn does.
+
+It runs with the settings of the environment, like the application:
+
+    python -m benchmarks.startup [--runs 10]
+
+`python -X importtime -c "import app.main"` tells which modules the import time goes to.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+CHILD = """
+import json, time
+start = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(app.main.app) as client:
+    response = client.get("/metrics", headers={"Authorization": f"Bearer {app.main.settings.MONITORING_TOKEN}"})
+    response.raise_for_status()
+responded = time.perf_counter()
+print(json.dumps({"import": imported - start, "first_request": responded - imported}))
+"""
+
+
+def run_once() -> dict[str, float]:
+    """Start the application in a new interpreter and return its timings in seconds."""
+
+    start = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD],
+        check=True,
+        capture_output=True,
+        text=True,
+        env={"MONITORING_TOKEN": "benchmark", **os.environ},
+    ).stdout
+    timings: dict[str, float] = json.loads(output.splitlines()[-1])
+    # The process start, including the interpreter, is only known to the parent
+    timings["total"] = time.perf_counter() - start
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10, help="interpreters started")
+    args = parser.parse_args()
+
+    # The first run warms up the bytecode and file system caches
+    run_once()
+    runs = [run_once() for _ in range(args.runs)]
+
+    print(f"Median of {args.runs} cold starts")
+    for name, label in (
+        ("import", "import app.main"),
+        ("first_request", "lifespan and first request"),
+        ("total", "process start to first response"),
+    ):
+        print(f"{label:<34} {statistics.median(run[name] for run in runs) * 1e3:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import os
+
+# The settings are read on import, so the test environment must be set before the app is imported
+os.environ.update(
+    POSTGRES_SERVER="localhost",
+    POSTGRES_USER="test",
+    ENVIRONMENT="local",
+    TASK_BROKER="stub",
+    STATE_BACKEND="memory",
+    STORAGE_BACKEND="memory",
+)
+
+from collections.abc import AsyncIterator  # noqa: E402
+
+import pytest  # noqa: E402
+from httpx import ASGITransport, AsyncClient  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine  # noqa: E402
+
+from app.config import get_settings  # noqa: E402
+from app.core.security import create_session_token  # noqa: E402
+from app.core.users import user_cache  # noqa: E402
+from app.db.config import SessionLocal  # noqa: E402
+from app.db.models import Base, UserORM  # noqa: E402
+from app.main import app  # noqa: E402
+
+
+@pytest.fixture
+def anyio_backend() -> str:
+    return "asyncio"
+
+
+@pytest.fixture
+async def engine() -> AsyncIterator[AsyncEngine]:
+    """Bind the sessions of the app to a new in-memory SQLite database."""
+
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    SessionLocal.configure(bind=engine)
+    user_cache.clear()
+    yield engine
+    await engine.dispose()
+
+
+@pytest.fixture
+async def user(engine: AsyncEngine) -> UserORM:
+    """Create a user with 100 credits."""
+
+    async with SessionLocal() as session:
+        async with session.begin():
+            user_orm = UserORM(google_id="google-id", name="Test", email="test@example.com", picture="", credits=100)
+            session.add(user_orm)
+    return user_orm
+
+
+@pytest.fixture
+async def client(user: UserORM) -> AsyncIterator[AsyncClient]:
+    """A client of the app signed in as `user`, running in the event loop of the test."""
+
+    cookies = {get_settings().SESSION_COOKIE_NAME: create_session_token(user.id, user.email)}
+    async with AsyncClient(transport=ASGITransport(app), base_url="http://test", cookies=cookies) as client:
+        yield client
@@ -0,0 +1,111 @@
+import uuid
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import func, select
+
+from app.api.routes import generation_routes
+from app.config import get_settings
+from app.core.credits import InsufficientCreditsError, reserve_credits
+from app.db.config import SessionLocal
+from app.db.models import CreditLedgerORM, CreditReason, GenerationORM, Status, UserORM
+from app.tasks import fail_generation
+
+settings = get_settings()
+
+
+async def get_credits(user_id: uuid.UUID) -> int:
+    async with SessionLocal() as session:
+        user_orm = await session.get(UserORM, user_id)
+        assert user_orm
+        return user_orm.credits
+
+
+async def get_ledger(user_id: uuid.UUID) -> list[tuple[CreditReason, int, int]]:
+    async with SessionLocal() as session:
+        statement = (
+            select(CreditLedgerORM.reason, CreditLedgerORM.amount, CreditLedgerORM.balance)
+            .where(CreditLedgerORM.user_id == user_id)
+            .order_by(CreditLedgerORM.created_at)
+        )
+        return [(row.reason, row.amount, row.balance) for row in await session.execute(statement)]
+
+
+@pytest.mark.integration
+@pytest.mark.anyio
+async def test_reserve_credits(user: UserORM) -> None:
+    async with SessionLocal() as session:
+        async with session.begin():
+            assert await reserve_credits(session, user.id, 30) == 70
+
+    assert await get_credits(user.id) == 70
+    assert await get_ledger(user.id) == [(CreditReason.GENERATION, -30, 70)]
+
+
+@pytest.mark.integration
+@pytest.mark.anyio
+async def test_reserve_more_credits_than_available(user: UserORM) -> None:
+    async with SessionLocal() as session:
+        async with session.begin():
+            with pytest.raises(InsufficientCreditsError):
+                await reserve_credits(session, user.id, 101)
+
+    assert await get_credits(user.id) == 100
+    assert await get_ledger(user.id) == []
+
+
+@pytest.mark.integration
+@pytest.mark.anyio
+async def test_create_generation_without_enough_credits(client: AsyncClient, user: UserORM) -> None:
+    async with SessionLocal() as session:
+        async with session.begin():
+            await reserve_credits(session, user.id, 100 - settings.GENERATION_COST + 1)
+
+    response = await client.post("/generations/create", data={"prompt": "a cat"})
+
+    assert response.status_code == 403
+    assert await get_credits(user.id) == settings.GENERATION_COST - 1
+    async with SessionLocal() as session:
+        assert await session.scalar(select(func.count()).select_from(GenerationORM)) == 0
+
+
+@pytest.mark.integration
+@pytest.mark.anyio
+async def test_fail_generation_refunds_once(client: AsyncClient, user: UserORM) -> None:
+    response = await client.post("/generations/create", data={"prompt": "a cat"})
+    assert response.status_code == 202
+    generation_id = uuid.UUID(response.json()["generation_id"])
+    assert await get_credits(user.id) == 100 - settings.GENERATION_COST
+
+    # A retried failure puts the generation back to pending without refunding it
+    await fail_generation(generation_id, RuntimeError("retried"), final_attempt=False)
+    assert await get_credits(user.id) == 100 - settings.GENERATION_COST
+
+    # Redelivered final failures only refund the credits once
+    await fail_generation(generation_id, RuntimeError("failed"), final_attempt=True)
+    await fail_generation(generation_id, RuntimeError("failed again"), final_attempt=True)
+
+    assert await get_credits(user.id) == 100
+    assert [reason for reason, _, _ in await get_ledger(user.id)] == [CreditReason.GENERATION, CreditReason.REFUND]
+    async with SessionLocal() as session:
+        generation_orm = await session.get(GenerationORM, generation_id)
+        assert generation_orm and generation_orm.status == Status.FAILED
+
+
+@pytest.mark.integration
+@pytest.mark.anyio
+async def test_generations_the_broker_refuses_are_refunded(
+    client: AsyncClient, user: UserORM, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    async def enqueue_generations(generation_ids: list[uuid.UUID]) -> None:
+        raise ConnectionError("The broker is down")
+
+    monkeypatch.setattr(generation_routes, "enqueue_generations", enqueue_generations)
+
+    response = await client.post("/generations/batch", json={"items": [{"prompt": "a cat"}, {"prompt": "a dog"}]})
+
+    assert response.status_code == 503
+    assert await get_credits(user.id) == 100
+    async with SessionLocal() as session:
+        statuses = await session.scalars(select(GenerationORM.status))
+        assert set(statuses) == {Status.FAILED}
@@ -0,0 +1,80 @@
+import uuid
+from datetime import datetime
+
+import pytest
+from httpx import AsyncClient
+
+from app.core.pagination import InvalidCursorError, decode_cursor, encode_cursor
+from app.db.config import SessionLocal
+from app.db.models import GenerationORM, OutputFormat, Ratio, Status, UserORM
+
+
+@pytest.mark.unit
+def test_cursor_round_trip() -> None:
+    created_at = datetime(2026, 1, 2, 3, 4, 5, 678901)
+    id = uuid.uuid4()
+
+    assert decode_cursor(encode_cursor(created_at, id)) == (created_at, id)
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    "cursor", ["", "not a cursor", "bm8tc2VwYXJhdG9y", encode_cursor(datetime.now(), uuid.uuid4())[:-4]]
+)
+def test_invalid_cursor(cursor: str) -> None:
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(cursor)
+
+
+@pytest.mark.integration
+@pytest.mark.anyio
+async def test_cursor_pages_break_ties_on_id(client: AsyncClient, user: UserORM) -> None:
+    # Generations created in the same instant are still paged through exactly once, in id order
+    created_at = datetime(2026, 1, 1)
+    async with SessionLocal() as session:
+        async with session.begin():
+            session.add_all(
+                GenerationORM(
+                    user_id=user.id,
+                    prompt=f"prompt {index}",
+                    output_format=OutputFormat.PNG,
+                    ratio=Ratio.RATIO_1_1,
+                    status=Status.PENDING,
+                    created_at=created_at,
+                )
+                for index in range(5)
+            )
+            session.add(
+                GenerationORM(
+                    user_id=user.id,
+                    prompt="latest",
+                    output_format=OutputFormat.PNG,
+                    ratio=Ratio.RATIO_1_1,
+                    status=Status.PENDING,
+                    created_at=datetime(2026, 1, 2),
+                )
+            )
+
+    ids: list[str] = []
+    cursor = None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        response = await client.get("/generations", params=params)
+        assert response.status_code == 200
+        page = response.json()
+        assert page["count"] == 6
+        ids.extend(generation["id"] for generation in page["data"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert len(ids) == len(set(ids)) == 6
+    assert ids[1:] == sorted(ids[1:], key=uuid.UUID, reverse=True)
+
+
+@pytest.mark.integration
+@pytest.mark.anyio
+async def test_invalid_cursor_is_rejected(client: AsyncClient) -> None:
+    response = await client.get("/generations", params={"cursor": "not a cursor"})
+
+    assert response.status_code == 400
@@ -0,0 +1,59 @@
+import uuid
+
+import pytest
+from httpx import AsyncClient
+
+from app.config import get_settings
+from app.core import security
+from app.core.security import InvalidTokenError, create_session_token, decode_session_token
+
+settings = get_settings()
+
+
+@pytest.mark.unit
+def test_session_token_round_trip() -> None:
+    user_id = uuid.uuid4()
+
+    claims = decode_session_token(create_session_token(user_id, "test@example.com", expires_in=60))
+
+    assert claims.user_id == user_id
+    assert claims.email == "test@example.com"
+    assert 0 < claims.expires_in <= 60
+
+
+@pytest.mark.unit
+def test_expired_session_token() -> None:
+    token = create_session_token(uuid.uuid4(), "test@example.com", expires_in=-1)
+
+    with pytest.raises(InvalidTokenError, match="expired"):
+        decode_session_token(token)
+
+
+@pytest.mark.unit
+def test_tampered_session_token() -> None:
+    token = create_session_token(uuid.uuid4(), "test@example.com")
+    payload, _, signature = token.partition(".")
+    # Claims signed for another user are rejected
+    other_payload, _, _ = create_session_token(uuid.uuid4(), "test@example.com").partition(".")
+
+    for tampered in (f"{other_payload}.{signature}", f"{payload}.{signature[:-1]}", payload, f"{payload}."):
+        with pytest.raises(InvalidTokenError):
+            decode_session_token(tampered)
+
+
+@pytest.mark.unit
+def test_session_token_of_another_key(monkeypatch: pytest.MonkeyPatch) -> None:
+    token = create_session_token(uuid.uuid4(), "test@example.com")
+    monkeypatch.setattr(security.settings, "SECRET_KEY", "another key")
+
+    with pytest.raises(InvalidTokenError):
+        decode_session_token(token)
+
+
+@pytest.mark.integration
+@pytest.mark.anyio
+async def test_invalid_session_is_unauthorized(client: AsyncClient) -> None:
+    assert (await client.get("/users/profile")).status_code == 200
+
+    client.cookies.set(settings.SESSION_COOKIE_NAME, "not.a-token")
+    assert (await client.get("/users/profile")).status_code == 401